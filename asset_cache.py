@@ -0,0 +1,123 @@
+"""
+On-disk cache of logo layers prepared for a given logo configuration.
+
+The static logo is rasterized once at its target size with opacity baked into
+the alpha channel, and the animated logo is transcoded once to a lossless RGBA
+movie at its target size. Entries are keyed on the source file's size and
+mtime plus the logo_configuration keys that change its pixels; placement keys
+do not count. Several configurations of one logo (e.g. from profiles or
+per-job overrides) live side by side. Only entries built from an older version
+of the source file are removed.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict
+
+from PIL import Image
+
+import ffmpeg_tools
+
+logger = logging.getLogger(__name__)
+
+# Where a logo is placed does not change the prepared layer
+PLACEMENT_KEYS = ('position', 'bottom_margin')
+
+
+def logo_target_size(logo_config: dict, source_size, default_height: int):
+    """Return the (width, height) a logo is shown at, keeping aspect ratio when one side is unset."""
+    source_width, source_height = source_size
+    width = logo_config.get('width')
+    height = logo_config.get('height', default_height)
+    if width and height:
+        return (width, height)
+    if width:
+        return (width, round(source_height * width / source_width))
+    return (round(source_width * height / source_height), height)
+
+
+class LogoAssetCache:
+    """Prepares resized, opacity-applied logo layers and reuses them across jobs."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.memo: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, kind: str, logo_config: dict, default_file: str, extension: str) -> str:
+        """Return the cache path for a logo: {kind}_{source}_{source version}_{appearance}{extension}."""
+        source = os.path.abspath(logo_config.get('file', default_file))
+        stat = os.stat(source)
+        appearance = {key: value for key, value in logo_config.items() if key not in PLACEMENT_KEYS}
+        source_id = hashlib.sha256(source.encode()).hexdigest()[:8]
+        version = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:8]
+        key = hashlib.sha256(json.dumps(appearance, sort_keys=True).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{kind}_{source_id}_{version}_{key}{extension}")
+
+    def _prune_stale(self, current_path: str):
+        """Delete entries built from an older version of the same source file."""
+        kind, source_id, version, _ = Path(current_path).stem.split('_', 3)
+        for entry in Path(self.cache_dir).glob(f"{kind}_{source_id}_*"):
+            if entry.name.endswith('.part') or entry.name.startswith(f"{kind}_{source_id}_{version}_"):
+                continue
+            try:
+                entry.unlink()
+                logger.info(f"Removed stale logo cache entry: {entry}")
+            except OSError:
+                pass
+
+    def _get_or_build(self, cache_path: str, builder):
+        """Return cache_path, building it first if no other job has."""
+        with self.lock:
+            if cache_path in self.memo and os.path.exists(cache_path):
+                return cache_path
+            if not os.path.exists(cache_path):
+                # Build under a process-unique name and rename so concurrent workers never see partial files
+                partial_path = f"{cache_path}.{os.getpid()}.part"
+                try:
+                    builder(partial_path)
+                    os.replace(partial_path, cache_path)
+                finally:
+                    if os.path.exists(partial_path):
+                        os.remove(partial_path)
+                logger.info(f"Built logo cache entry: {cache_path}")
+                self._prune_stale(cache_path)
+            self.memo[cache_path] = cache_path
+            return cache_path
+
+    def get_static_logo(self, logo_config: dict) -> str:
+        """Return a PNG of the static logo at its target size and opacity."""
+        cache_path = self._cache_path('static', logo_config, 'assets/static_logo.png', '.png')
+
+        def build(partial_path: str):
+            img = Image.open(logo_config.get('file', 'assets/static_logo.png')).convert('RGBA')
+            size = logo_target_size(logo_config, img.size, 80)
+            if img.size != size:
+                img = img.resize(size, Image.LANCZOS)
+
+            opacity = logo_config.get('opacity', 1.0)
+            if opacity != 1.0:
+                img.putalpha(img.getchannel('A').point(lambda a: int(a * opacity)))
+            img.save(partial_path, 'PNG')
+
+        return self._get_or_build(cache_path, build)
+
+    def get_animated_logo(self, logo_config: dict) -> str:
+        """Return a lossless RGBA movie of the animated logo at its target size and opacity."""
+        cache_path = self._cache_path('animated', logo_config, 'assets/video_logo.mp4', '.mov')
+
+        def build(partial_path: str):
+            ffmpeg_tools.run_ffmpeg([
+                '-i', logo_config.get('file', 'assets/video_logo.mp4'),
+                '-vf', ffmpeg_tools.logo_filter(logo_config, 100),
+                '-c:v', 'png', '-pix_fmt', 'rgba',
+                '-c:a', 'copy',
+                '-f', 'mov', partial_path
+            ])
+
+        return self._get_or_build(cache_path, build)
@@ -0,0 +1,298 @@
+"""
+Benchmark suite for the branding pipeline.
+
+Generates synthetic inputs with FFmpeg's lavfi testsrc2/sine sources, runs
+VideoProcessor._process_video_once on each one in a fresh child process and
+records wall time, encode fps, peak RSS of the whole process tree (Python plus
+its ffmpeg children) and CPU utilization. Results are written as JSON and can
+be compared against an earlier run to catch regressions.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --resolutions 480p,1080p,4k --durations 10s,5min --codecs libx264,libx265
+    python benchmarks/run_benchmarks.py --set performance_settings.encode_mode=segmented --compare benchmarks/results/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import subprocess
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import psutil
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+sys.path.insert(0, REPO_ROOT)
+
+RESOLUTIONS = {'480p': (854, 480), '1080p': (1920, 1080), '4k': (3840, 2160)}
+DURATIONS = {'10s': 10, '5min': 300, '60min': 3600}
+INPUT_FPS = 30
+SAMPLE_INTERVAL = 0.2
+
+
+def generate_input(resolution: str, duration: str, inputs_dir: str) -> str:
+    """Create (once) a synthetic test video with a moving pattern and a tone."""
+    path = os.path.join(inputs_dir, f"testsrc_{resolution}_{duration}.mp4")
+    if os.path.exists(path):
+        return path
+    import ffmpeg_tools
+
+    os.makedirs(inputs_dir, exist_ok=True)
+    width, height = RESOLUTIONS[resolution]
+    seconds = DURATIONS[duration]
+    partial_path = path + '.part.mp4'
+    print(f"Generating {os.path.basename(path)}...", flush=True)
+    ffmpeg_tools.run_ffmpeg([
+        '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate={INPUT_FPS}:duration={seconds}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest', partial_path
+    ])
+    os.replace(partial_path, path)
+    return path
+
+
+def parse_overrides(pairs: List[str]) -> Dict[str, Any]:
+    """Parse --set section.key=value pairs; values are read as JSON when possible."""
+    overrides: Dict[str, Any] = {}
+    for pair in pairs:
+        key, _, raw = pair.partition('=')
+        if '.' not in key or not raw:
+            raise ValueError(f"Expected section.key=value, got: {pair}")
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        section, name = key.split('.', 1)
+        overrides.setdefault(section, {})[name] = value
+    return overrides
+
+
+def prepare_workspace(case: Dict[str, Any], input_path: str, work_root: str, overrides: Dict[str, Any]) -> str:
+    """Lay out a throwaway working directory with settings, assets and the input video."""
+    workspace = os.path.join(work_root, case['name'])
+    shutil.rmtree(workspace, ignore_errors=True)
+    os.makedirs(os.path.join(workspace, 'input'))
+
+    with open(os.path.join(REPO_ROOT, 'settings.json')) as f:
+        settings = json.load(f)
+    for section, values in overrides.items():
+        settings.setdefault(section, {}).update(values)
+    settings.setdefault('output_settings', {})['video_codec'] = case['codec']
+    settings.setdefault('advanced_settings', {})['retry_failed_processing'] = False
+    # Keep the cache inside the workspace so every case pays the same asset preparation cost
+    settings.setdefault('performance_settings', {})['asset_cache_dir'] = 'cache/assets'
+    with open(os.path.join(workspace, 'settings.json'), 'w') as f:
+        json.dump(settings, f, indent=4)
+
+    os.symlink(os.path.join(REPO_ROOT, 'assets'), os.path.join(workspace, 'assets'))
+    # The pipeline moves its input to processed/, so give it a link rather than the cached original
+    case_input = os.path.join(workspace, 'input', os.path.basename(input_path))
+    try:
+        os.link(input_path, case_input)
+    except OSError:
+        shutil.copy2(input_path, case_input)
+    return workspace
+
+
+def run_case_in_child(workspace: str, video_name: str, result_path: str):
+    """Entry point of the child process: run one branding job and report timings."""
+    os.chdir(workspace)
+    from main import VideoProcessor
+
+    processor = VideoProcessor()
+    video_path = os.path.join('input', video_name)
+    info = processor.get_video_info(video_path)
+    started = time.monotonic()
+    error = None
+    try:
+        result = processor._process_video_once(video_path)
+    except Exception as e:
+        result, error = False, str(e)
+    wall = time.monotonic() - started
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Outputs still awaiting deep validation sit in output/.partial/
+    outputs = [os.path.join(root, name) for root, _, names in os.walk('output') for name in names]
+    with open(result_path, 'w') as f:
+        json.dump({
+            'ok': bool(result),
+            'error': error,
+            'wall_seconds': wall,
+            'frames': int(round(info['duration'] * info['fps'])),
+            'cpu_seconds': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+            'output_bytes': sum(os.path.getsize(path) for path in outputs)
+        }, f)
+
+
+def tree_rss(process: psutil.Process) -> int:
+    """Resident memory of a process and all of its live descendants."""
+    total = 0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+def run_case(case: Dict[str, Any], input_path: str, work_root: str, overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one benchmark case in a child process while sampling its memory."""
+    workspace = prepare_workspace(case, input_path, work_root, overrides)
+    result_path = os.path.join(workspace, 'result.json')
+    child = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--run-case', workspace, os.path.basename(input_path), result_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    monitor = psutil.Process(child.pid)
+    peak_rss = 0
+    while child.poll() is None:
+        try:
+            peak_rss = max(peak_rss, tree_rss(monitor))
+        except psutil.NoSuchProcess:
+            break
+        time.sleep(SAMPLE_INTERVAL)
+    child.wait()
+
+    if not os.path.exists(result_path):
+        return {**case, 'ok': False, 'error': f"Benchmark process exited with code {child.returncode}"}
+    with open(result_path) as f:
+        measured = json.load(f)
+    wall = max(measured['wall_seconds'], 1e-6)
+    return {
+        **case,
+        **measured,
+        'fps': measured['frames'] / wall,
+        'peak_rss_mb': peak_rss / (1024 * 1024),
+        'cpu_utilization': measured['cpu_seconds'] / wall / (os.cpu_count() or 1),
+        'input_bytes': os.path.getsize(input_path)
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine and code revision a run was taken on."""
+    from moviepy.config import FFMPEG_BINARY
+
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        revision = None
+    version = subprocess.run([FFMPEG_BINARY, '-version'], capture_output=True, text=True).stdout.split('\n', 1)[0]
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'memory_mb': psutil.virtual_memory().total // (1024 * 1024),
+        'ffmpeg': version
+    }
+
+
+def compare(current: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> int:
+    """Print per-case changes against a baseline run. Returns the number of regressions."""
+    with open(baseline_path) as f:
+        baseline = {result['name']: result for result in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    for result in current:
+        before = baseline.get(result['name'])
+        if before is None or not before.get('ok') or not result.get('ok'):
+            print(f"  {result['name']}: no comparable baseline")
+            continue
+        fps_change = result['fps'] / before['fps'] - 1
+        rss_change = result['peak_rss_mb'] / before['peak_rss_mb'] - 1 if before['peak_rss_mb'] else 0.0
+        flags = []
+        if fps_change < -tolerance:
+            flags.append('FPS REGRESSION')
+        if rss_change > tolerance:
+            flags.append('MEMORY REGRESSION')
+        regressions += len(flags)
+        print(
+            f"  {result['name']}: fps {before['fps']:.1f} -> {result['fps']:.1f} ({fps_change:+.1%}), "
+            f"peak RSS {before['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB ({rss_change:+.1%})"
+            f"{'  ' + ', '.join(flags) if flags else ''}"
+        )
+    return regressions
+
+
+def parse_list(value: str, choices: Dict[str, Any]) -> List[str]:
+    names = list(choices) if value == 'all' else [v.strip() for v in value.split(',') if v.strip()]
+    unknown = [name for name in names if name not in choices]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown value(s) {unknown}; choose from {list(choices)} or 'all'")
+    return names
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--run-case']:
+        run_case_in_child(*argv[1:4])
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark the branding pipeline on synthetic videos.")
+    parser.add_argument('--resolutions', default='480p,1080p', help="Comma list of 480p,1080p,4k or 'all'")
+    parser.add_argument('--durations', default='10s', help="Comma list of 10s,5min,60min or 'all'")
+    parser.add_argument('--codecs', default='libx264', help="Comma list of video encoders")
+    parser.add_argument('--set', action='append', default=[], metavar='SECTION.KEY=VALUE',
+                        help="Override a settings.json value for every case (repeatable)")
+    parser.add_argument('--inputs-dir', default=os.path.join(BENCH_DIR, 'inputs'))
+    parser.add_argument('--work-dir', default=os.path.join(BENCH_DIR, 'work'))
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier result file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed relative slowdown or memory growth")
+    args = parser.parse_args(argv)
+
+    resolutions = parse_list(args.resolutions, RESOLUTIONS)
+    durations = parse_list(args.durations, DURATIONS)
+    codecs = [c.strip() for c in args.codecs.split(',') if c.strip()]
+    overrides = parse_overrides(args.set)
+
+    results = []
+    for resolution in resolutions:
+        for duration in durations:
+            input_path = generate_input(resolution, duration, args.inputs_dir)
+            for codec in codecs:
+                case = {
+                    'name': f"{resolution}_{duration}_{codec}",
+                    'resolution': resolution,
+                    'duration': duration,
+                    'codec': codec
+                }
+                print(f"Running {case['name']}...", flush=True)
+                result = run_case(case, input_path, args.work_dir, overrides)
+                results.append(result)
+                if result['ok']:
+                    print(
+                        f"  {result['wall_seconds']:.1f}s wall, {result['fps']:.1f} fps, "
+                        f"peak RSS {result['peak_rss_mb']:.0f} MB, CPU {result['cpu_utilization']:.0%}",
+                        flush=True
+                    )
+                else:
+                    print(f"  FAILED: {result.get('error')}", flush=True)
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'environment': environment(), 'overrides': overrides, 'results': results}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    failed = sum(1 for result in results if not result['ok'])
+    regressions = compare(results, args.compare, args.tolerance) if args.compare else 0
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
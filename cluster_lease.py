@@ -0,0 +1,206 @@
+"""
+File leases for running several nodes against one shared input folder.
+
+A node may process a video only while it holds the video's lease: a small
+file in a shared lease folder (e.g. on the same NFS mount as the input). No
+broker is involved:
+
+- Acquiring creates the lease with O_CREAT | O_EXCL, which is atomic on
+  local filesystems and on NFSv3 and later. Exactly one node succeeds.
+- A heartbeat thread touches every held lease, so its mtime stays fresh.
+- A lease whose mtime is older than the TTL belongs to a dead or stalled
+  node. Another node reclaims it by renaming it to a private tombstone, which
+  only one node can do. The reclaimer then re-checks that the tombstone is
+  still stale before creating its own lease. If the lease was renewed in the
+  meantime, it is restored. While the lease is renamed its file is missing,
+  so the owner treats a missing lease as a reclaim in progress, not a loss.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long a missing lease file may take to come back before the lease counts as gone
+RECLAIM_WAIT_SECONDS = 1.0
+
+
+class LeaseLost(Exception):
+    """Raised when this node no longer owns the lease on the video it is about to publish."""
+
+
+class LeaseManager:
+    """Acquires, renews and releases leases on input files for one node."""
+
+    def __init__(self, lease_dir: str, node_id: str, ttl_seconds: float = 120, heartbeat_seconds: float = 20):
+        self.lease_dir = lease_dir
+        self.node_id = node_id
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lock = threading.Lock()
+        self.held: Dict[str, str] = {}
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        os.makedirs(lease_dir, exist_ok=True)
+
+    def lease_path(self, video_path: str) -> str:
+        # Every node sees the shared folder at its own mount point, so key on the path relative to the lease folder
+        relative = os.path.relpath(os.path.abspath(video_path), os.path.dirname(os.path.abspath(self.lease_dir)))
+        return os.path.join(self.lease_dir, hashlib.sha1(relative.encode()).hexdigest()[:20] + '.lease')
+
+    def _is_stale(self, path: str) -> bool:
+        return time.time() - os.stat(path).st_mtime > self.ttl_seconds
+
+    @staticmethod
+    def _read_owner(lease: str) -> Optional[str]:
+        """Return the node named in a lease file. Raises FileNotFoundError while the file is missing."""
+        try:
+            with open(lease) as f:
+                return json.load(f).get('node')
+        except ValueError:
+            # Created but not written yet by the node acquiring it
+            return None
+
+    def owner(self, video_path: str) -> Optional[str]:
+        """Return the node holding the lease on video_path, or None."""
+        try:
+            return self._read_owner(self.lease_path(video_path))
+        except OSError:
+            return None
+
+    def owns(self, video_path: str) -> bool:
+        """True if the lease file names this node.
+
+        A reclaiming node briefly renames even a live lease (see _reclaim), so a missing
+        file gets RECLAIM_WAIT_SECONDS to come back before the lease counts as gone.
+        """
+        lease = self.lease_path(video_path)
+        deadline = time.monotonic() + RECLAIM_WAIT_SECONDS
+        while True:
+            try:
+                return self._read_owner(lease) == self.node_id
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+            except OSError:
+                return False
+
+    def _create(self, lease: str, video_path: str) -> bool:
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'node': self.node_id, 'host': socket.gethostname(), 'path': video_path,
+                       'acquired': time.time()}, f)
+        return True
+
+    def _reclaim(self, lease: str) -> bool:
+        """Move an expired lease out of the way. Returns True if the lease path is now free."""
+        tombstone = f"{lease}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(lease, tombstone)
+        except FileNotFoundError:
+            # Another node reclaimed (or its owner released) it first
+            return True
+        if time.time() - os.stat(tombstone).st_mtime <= self.ttl_seconds:
+            # Renewed, or re-acquired by another reclaimer, between our check and the rename: put it back
+            try:
+                os.link(tombstone, lease)
+            except FileExistsError:
+                pass
+            os.remove(tombstone)
+            return False
+        try:
+            with open(tombstone) as f:
+                logger.warning(f"Reclaiming expired lease of node {json.load(f).get('node')}")
+        except (OSError, ValueError):
+            pass
+        os.remove(tombstone)
+        return True
+
+    def acquire(self, video_path: str) -> bool:
+        """Take the lease on video_path. Returns False if a live node holds it."""
+        lease = self.lease_path(video_path)
+        for _ in range(2):
+            if self._create(lease, video_path):
+                with self.lock:
+                    self.held[video_path] = lease
+                return True
+            try:
+                if not self._is_stale(lease) or not self._reclaim(lease):
+                    return False
+            except FileNotFoundError:
+                # Released between our create attempt and the check; try again
+                continue
+        return False
+
+    def holds(self, video_path: str) -> bool:
+        """True while this node still owns the lease (it has not expired and been taken over)."""
+        with self.lock:
+            if video_path not in self.held:
+                return False
+        return self.owns(video_path)
+
+    def release(self, video_path: str):
+        """Give up the lease if this node still owns it."""
+        with self.lock:
+            lease = self.held.pop(video_path, None)
+        if lease is not None and self.owns(video_path):
+            try:
+                os.remove(lease)
+            except FileNotFoundError:
+                pass
+
+    def renew(self):
+        """Refresh the mtime of every held lease; leases taken over by another node are dropped."""
+        with self.lock:
+            held = dict(self.held)
+        for video_path, lease in held.items():
+            try:
+                owner = self._read_owner(lease)
+            except FileNotFoundError:
+                # Renamed by a node checking whether it expired; a live lease is put back, so keep it
+                continue
+            except OSError as e:
+                logger.warning(f"Could not read the lease on {video_path}: {e}")
+                continue
+            if owner != self.node_id:
+                logger.error(f"Lost the lease on {video_path}; another node has taken it over")
+                with self.lock:
+                    self.held.pop(video_path, None)
+                continue
+            try:
+                os.utime(lease)
+            except FileNotFoundError:
+                pass
+
+    def _heartbeat(self):
+        while not self.stop_event.wait(self.heartbeat_seconds):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.warning(f"Lease heartbeat failed: {e}")
+
+    def start(self):
+        self.thread = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        self.thread.start()
+        logger.info(f"Cluster node {self.node_id} using leases in {self.lease_dir} (TTL {self.ttl_seconds}s)")
+
+    def stop(self):
+        """Stop renewing and release every lease still held."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            held = list(self.held)
+        for video_path in held:
+            self.release(video_path)
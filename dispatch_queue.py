@@ -0,0 +1,114 @@
+"""
+Bounded, deduplicating hand-off between file detection and processing.
+
+Producers (the readiness tracker and the startup scan) put paths. A fixed set
+of consumer threads takes them and runs the handler. A path that is already
+waiting is not queued twice. When the queue is full, producers wait up to a
+timeout, and the time spent waiting and any rejections are counted as
+backpressure.
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DispatchQueue:
+    """Bounded work queue with path de-duplication and backpressure statistics."""
+
+    def __init__(self, handler: Callable[[str], None], workers: int, maxsize: int = 100, put_timeout: float = 5.0):
+        self.handler = handler
+        self.workers = workers
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.put_timeout = put_timeout
+        self.waiting = set()
+        self.lock = threading.Lock()
+        self.stats_data = {
+            'enqueued': 0,
+            'deduplicated': 0,
+            'blocked_puts': 0,
+            'rejected': 0,
+            'blocked_seconds': 0.0,
+            'high_water': 0
+        }
+        self.threads: List[threading.Thread] = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._consume, name=f"dispatch-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, path: str) -> bool:
+        """Queue a path for the consumers. Returns False if it was rejected because the queue stayed full."""
+        with self.lock:
+            if path in self.waiting:
+                self.stats_data['deduplicated'] += 1
+                return True
+            self.waiting.add(path)
+
+        try:
+            self.queue.put_nowait(path)
+        except queue.Full:
+            started = time.monotonic()
+            with self.lock:
+                self.stats_data['blocked_puts'] += 1
+            logger.warning(f"Dispatch queue full ({self.queue.maxsize}); waiting up to {self.put_timeout}s to queue {path}")
+            try:
+                self.queue.put(path, timeout=self.put_timeout)
+            except queue.Full:
+                with self.lock:
+                    self.waiting.discard(path)
+                    self.stats_data['rejected'] += 1
+                    self.stats_data['blocked_seconds'] += time.monotonic() - started
+                return False
+            with self.lock:
+                self.stats_data['blocked_seconds'] += time.monotonic() - started
+
+        with self.lock:
+            self.stats_data['enqueued'] += 1
+            self.stats_data['high_water'] = max(self.stats_data['high_water'], self.queue.qsize())
+        return True
+
+    def _consume(self):
+        while True:
+            path = self.queue.get()
+            try:
+                if path is _STOP:
+                    return
+                with self.lock:
+                    self.waiting.discard(path)
+                self.handler(path)
+            except Exception as e:
+                logger.error(f"Dispatch handler failed for {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """Block until every queued path has been handled."""
+        self.queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, capacity and backpressure counters."""
+        with self.lock:
+            return {'depth': self.queue.qsize(), 'capacity': self.queue.maxsize, **self.stats_data}
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"Dispatch queue: depth {stats['depth']}/{stats['capacity']}, high water {stats['high_water']}, "
+            f"{stats['enqueued']} enqueued, {stats['deduplicated']} deduplicated, "
+            f"{stats['blocked_puts']} blocked ({stats['blocked_seconds']:.1f}s), {stats['rejected']} rejected"
+        )
+
+    def stop(self):
+        """Let running handlers finish and stop the consumer threads."""
+        for _ in self.threads:
+            self.queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
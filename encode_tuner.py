@@ -0,0 +1,165 @@
+"""
+Picks the fastest x264/x265 preset and the highest CRF that still meet a quality target.
+
+A short sample from the middle of the input is cut once as a lossless
+reference. Trial encodes go from the fastest preset to slower ones. For each
+preset, CRF values are tried from the highest down until the SSIM against the
+reference meets the target, and within the bitrate cap if one is set. The
+first preset that meets both wins.
+
+Decisions are cached per content class: the codec, a resolution bucket, a
+motion level measured from the sample, and the targets. Similar videos reuse
+a decision without any trial encodes.
+"""
+
+import os
+import re
+import json
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from typing import Dict, Any, List, Optional
+
+from moviepy.config import FFMPEG_BINARY
+
+import ffmpeg_tools
+
+logger = logging.getLogger(__name__)
+
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow']
+# Bits per pixel of the reference-speed probe encode that separate motion levels
+MOTION_THRESHOLDS = [(0.03, 'low'), (0.10, 'medium')]
+
+_lock = threading.Lock()
+
+
+def resolution_bucket(size) -> str:
+    height = min(size)
+    for limit, name in ((480, 'sd'), (720, 'hd'), (1080, 'fhd'), (1440, 'qhd')):
+        if height <= limit:
+            return name
+    return 'uhd'
+
+
+def _measure_ssim(encoded_path: str, reference_path: str) -> float:
+    """Return the overall SSIM of an encode against its reference."""
+    result = subprocess.run(
+        [FFMPEG_BINARY, '-hide_banner', '-nostdin', '-i', encoded_path, '-i', reference_path,
+         '-lavfi', '[0:v][1:v]ssim', '-f', 'null', '-'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    match = re.search(r'All:([0-9.]+)', result.stderr)
+    if result.returncode != 0 or match is None:
+        raise RuntimeError(f"SSIM measurement failed: {result.stderr.strip()[-300:]}")
+    return float(match.group(1))
+
+
+def _trial_encode(codec: str, reference_path: str, preset: str, crf: int, output_path: str, seconds: float) -> Dict[str, float]:
+    ffmpeg_tools.run_ffmpeg([
+        '-i', reference_path, '-c:v', codec, '-preset', preset, '-crf', str(crf),
+        '-pix_fmt', 'yuv420p', '-an', output_path
+    ])
+    return {
+        'ssim': _measure_ssim(output_path, reference_path),
+        'kbps': os.path.getsize(output_path) * 8 / 1000 / seconds
+    }
+
+
+class EncodeTuner:
+    """Chooses preset/crf per content class and remembers the choice in a JSON cache."""
+
+    def __init__(self, tuning_settings: dict, work_dir: str):
+        self.settings = tuning_settings
+        self.work_dir = work_dir
+        self.cache_path = tuning_settings.get('cache_path', 'cache/encode_tuning.json')
+        self.target_ssim = tuning_settings.get('target_ssim', 0.98)
+        self.max_bitrate_kbps = tuning_settings.get('max_bitrate_kbps')
+        self.sample_seconds = tuning_settings.get('sample_seconds', 4)
+        self.presets = tuning_settings.get('presets', PRESETS)
+        self.crf_min, self.crf_max = tuning_settings.get('crf_range', [18, 28])
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store(self, key: str, decision: Dict[str, Any]):
+        with _lock:
+            cache = self._load()
+            cache[key] = decision
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            partial_path = f"{self.cache_path}.{os.getpid()}.part"
+            with open(partial_path, 'w') as f:
+                json.dump(cache, f, indent=2, sort_keys=True)
+            os.replace(partial_path, self.cache_path)
+
+    def _motion_level(self, reference_path: str, trial_dir: str, video_info: dict, seconds: float) -> str:
+        """Classify motion from how many bits a fixed fast encode of the sample needs per pixel."""
+        probe_path = os.path.join(trial_dir, 'motion.mp4')
+        ffmpeg_tools.run_ffmpeg([
+            '-i', reference_path, '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23',
+            '-pix_fmt', 'yuv420p', '-an', probe_path
+        ])
+        width, height = video_info['size']
+        pixels = width * height * max(video_info['fps'] * seconds, 1)
+        bits_per_pixel = os.path.getsize(probe_path) * 8 / pixels
+        for limit, level in MOTION_THRESHOLDS:
+            if bits_per_pixel < limit:
+                return level
+        return 'high'
+
+    def tune(self, video_path: str, video_info: dict, codec: str) -> Optional[Dict[str, Any]]:
+        """Return {'preset', 'crf', ...} for this video, or None if no candidate met the targets."""
+        os.makedirs(self.work_dir, exist_ok=True)
+        trial_dir = tempfile.mkdtemp(prefix='tune_', dir=self.work_dir)
+        try:
+            seconds = min(self.sample_seconds, video_info['duration'])
+            start = max(0.0, video_info['duration'] / 2 - seconds / 2)
+            reference_path = os.path.join(trial_dir, 'reference.mkv')
+            ffmpeg_tools.run_ffmpeg([
+                '-ss', f"{start:.3f}", '-i', video_path, '-t', f"{seconds:.3f}",
+                '-map', '0:v:0', '-c:v', 'libx264', '-preset', 'ultrafast', '-qp', '0', reference_path
+            ])
+
+            key = '|'.join([
+                codec, resolution_bucket(video_info['size']), self._motion_level(reference_path, trial_dir, video_info, seconds),
+                f"ssim>={self.target_ssim}", f"kbps<={self.max_bitrate_kbps}"
+            ])
+            cached = self._load().get(key)
+            if cached is not None:
+                logger.info(f"Encode tuning for {key}: preset={cached['preset']}, crf={cached['crf']} (cached)")
+                return cached
+
+            decision = self._search(codec, reference_path, trial_dir, seconds)
+            if decision is None:
+                logger.warning(f"No preset/crf met SSIM {self.target_ssim} for {key}; keeping configured values")
+                return None
+            decision['content_class'] = key
+            self._store(key, decision)
+            logger.info(
+                f"Encode tuning for {key}: preset={decision['preset']}, crf={decision['crf']} "
+                f"(SSIM {decision['ssim']:.4f}, {decision['kbps']:.0f} kb/s)"
+            )
+            return decision
+        finally:
+            shutil.rmtree(trial_dir, ignore_errors=True)
+
+    def _search(self, codec: str, reference_path: str, trial_dir: str, seconds: float) -> Optional[Dict[str, Any]]:
+        crfs: List[int] = list(range(self.crf_max, self.crf_min - 1, -2))
+        for preset in self.presets:
+            for crf in crfs:
+                output_path = os.path.join(trial_dir, f"{preset}_{crf}.mp4")
+                measured = _trial_encode(codec, reference_path, preset, crf, output_path, seconds)
+                os.remove(output_path)
+                if measured['ssim'] < self.target_ssim:
+                    # Lower CRF means higher quality; keep going down for this preset
+                    continue
+                if self.max_bitrate_kbps and measured['kbps'] > self.max_bitrate_kbps:
+                    # Quality is met but only at a size over the cap; a slower preset compresses better
+                    break
+                return {'preset': preset, 'crf': crf, **measured}
+        return None
@@ -0,0 +1,257 @@
+"""
+Detects which H.264 encoders actually work on this machine.
+
+Listing an encoder in `ffmpeg -encoders` only means FFmpeg was built with it.
+The hardware encoders also need a driver and a device at runtime. Every
+candidate is therefore checked with a tiny trial encode. Results are cached
+in a JSON file keyed on the FFmpeg binary, so the probe runs once per machine
+rather than once per job or worker. They are probed again when they get older
+than the configured TTL, or when the GPU device nodes or driver version change
+(a driver installed, a card added or removed). An encoder marked failed by
+one worker process reaches the others through the cache file: each process
+re-reads the file when its mtime changes.
+"""
+
+import os
+import glob
+import json
+import time
+import hashlib
+import logging
+import threading
+import subprocess
+from typing import Dict, List, Optional
+
+from moviepy.config import FFMPEG_BINARY
+
+logger = logging.getLogger(__name__)
+
+# Hardware encoders that take ordinary software frames, fastest first. VAAPI is
+# left out because it needs hwupload on the input side, which MoviePy's writer cannot add.
+HARDWARE_ENCODERS = ['h264_nvenc', 'h264_qsv', 'h264_videotoolbox', 'h264_amf']
+SOFTWARE_ENCODERS = ['libx264', 'libopenh264']
+
+_lock = threading.Lock()
+_results: Dict[str, bool] = {}
+_listed: Optional[set] = None
+# Device fingerprint and probe time behind _results; generation counts reloads so callers can drop their choices.
+# cache_mtime is the cache file version last merged into _results.
+_state = {'devices': None, 'probed_at': 0.0, 'generation': 0, 'cache_mtime': None}
+
+DEVICE_PATTERNS = ['/dev/nvidia*', '/dev/dri/*']
+DRIVER_VERSION_FILES = ['/proc/driver/nvidia/version', '/sys/module/i915/version', '/sys/module/amdgpu/version']
+
+
+def _binary_key() -> str:
+    stat = os.stat(FFMPEG_BINARY) if os.path.exists(FFMPEG_BINARY) else None
+    return f"{os.path.realpath(FFMPEG_BINARY)}:{stat.st_size if stat else 0}:{stat.st_mtime_ns if stat else 0}"
+
+
+def device_fingerprint() -> str:
+    """Describe the GPU device nodes and driver versions, so a change to either forces a new probe."""
+    parts = sorted(path for pattern in DEVICE_PATTERNS for path in glob.glob(pattern))
+    for path in DRIVER_VERSION_FILES:
+        try:
+            with open(path) as f:
+                parts.append(f"{path}={f.readline().strip()}")
+        except OSError:
+            continue
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:16]
+
+
+def listed_encoders() -> set:
+    """Return the video encoder names compiled into the FFmpeg binary."""
+    global _listed
+    if _listed is None:
+        result = subprocess.run(
+            [FFMPEG_BINARY, '-hide_banner', '-encoders'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        names = set()
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].startswith('V') and len(parts[0]) == 6 and parts[1] != '=':
+                names.add(parts[1])
+        _listed = names
+    return _listed
+
+
+def trial_encode(codec: str) -> bool:
+    """Encode a few frames of a synthetic source with the codec and report whether it worked."""
+    try:
+        result = subprocess.run(
+            [FFMPEG_BINARY, '-hide_banner', '-nostdin', '-loglevel', 'error',
+             '-f', 'lavfi', '-i', 'testsrc2=size=256x144:rate=10:duration=0.5',
+             '-c:v', codec, '-pix_fmt', 'yuv420p', '-frames:v', '5', '-f', 'null', '-'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=30
+        )
+    except subprocess.TimeoutExpired:
+        logger.warning(f"Trial encode with {codec} timed out")
+        return False
+    if result.returncode != 0:
+        logger.info(f"Encoder {codec} is not usable here: {result.stderr.strip()[-200:]}")
+    return result.returncode == 0
+
+
+def _load_cache(cache_path: str) -> dict:
+    try:
+        with open(cache_path) as f:
+            entry = json.load(f).get(_binary_key(), {})
+    except (OSError, ValueError):
+        return {}
+    # Entries written before probe times were recorded are plain results and count as stale
+    return entry if isinstance(entry.get('results'), dict) else {}
+
+
+def _cache_mtime(cache_path: str) -> Optional[int]:
+    try:
+        return os.stat(cache_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _shared_results(entry: dict) -> Dict[str, bool]:
+    """Results another process saved for the same devices and probe round (or a later one)."""
+    if entry.get('devices') != _state['devices'] or entry.get('probed_at', 0) < _state['probed_at']:
+        return {}
+    return entry['results']
+
+
+def _merge_cache(cache_path: str) -> bool:
+    """Take in results other processes saved since the last look; caller holds _lock.
+
+    Failures win over this process's results. Returns True if an encoder this process
+    thought usable turned out to have failed.
+    """
+    mtime = _cache_mtime(cache_path)
+    if mtime is None or mtime == _state['cache_mtime']:
+        return False
+    _state['cache_mtime'] = mtime
+    revoked = False
+    for codec, works in _shared_results(_load_cache(cache_path)).items():
+        if not works:
+            revoked = revoked or _results.get(codec) is True
+            _results[codec] = False
+        else:
+            _results.setdefault(codec, works)
+    return revoked
+
+
+def _save_cache(cache_path: str):
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    # Keep failures another worker recorded since this process last read the file
+    entry = data.get(_binary_key())
+    if isinstance(entry, dict) and isinstance(entry.get('results'), dict):
+        for codec, works in _shared_results(entry).items():
+            if not works:
+                _results[codec] = False
+    data[_binary_key()] = {'devices': _state['devices'], 'probed_at': _state['probed_at'], 'results': _results}
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    partial_path = f"{cache_path}.{os.getpid()}.part"
+    with open(partial_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(partial_path, cache_path)
+    _state['cache_mtime'] = _cache_mtime(cache_path)
+
+
+def _refresh(cache_path: str, ttl_seconds: Optional[float]):
+    """Drop the results when they are older than ttl_seconds or the devices changed; caller holds _lock."""
+    devices = device_fingerprint()
+    now = time.time()
+    if _state['devices'] == devices and (not ttl_seconds or now - _state['probed_at'] < ttl_seconds):
+        if _merge_cache(cache_path):
+            logger.info("Another worker marked an encoder as failed; choosing encoders again")
+            _state['generation'] += 1
+        return
+    _results.clear()
+    _state['cache_mtime'] = _cache_mtime(cache_path)
+    entry = _load_cache(cache_path)
+    if entry.get('devices') == devices and (not ttl_seconds or now - entry.get('probed_at', 0) < ttl_seconds):
+        _results.update(entry['results'])
+        _state['probed_at'] = entry['probed_at']
+    else:
+        if _state['devices'] is not None or entry:
+            logger.info("Encoder probe results are stale or the GPU devices changed; probing again")
+        _state['probed_at'] = now
+    _state['devices'] = devices
+    _state['generation'] += 1
+
+
+def refresh(cache_path: str, ttl_seconds: Optional[float] = None) -> int:
+    """Reload or expire the probe results as needed. Returns a number that changes whenever they were reset."""
+    with _lock:
+        _refresh(cache_path, ttl_seconds)
+        return _state['generation']
+
+
+def encoder_works(codec: str, cache_path: str, ttl_seconds: Optional[float] = None) -> bool:
+    """Return whether an encoder passed its trial encode, probing it on first use."""
+    with _lock:
+        _refresh(cache_path, ttl_seconds)
+        if codec not in _results:
+            _results[codec] = codec in listed_encoders() and trial_encode(codec)
+            _save_cache(cache_path)
+        return _results[codec]
+
+
+def mark_failed(codec: str, cache_path: str):
+    """Record that an encoder failed on a real job so later jobs skip it."""
+    with _lock:
+        _results[codec] = False
+        _save_cache(cache_path)
+
+
+def select_encoder(preferred: str, use_hardware: bool, gpu_codec: Optional[str], cache_path: str,
+                   ttl_seconds: Optional[float] = None) -> str:
+    """Pick the first working encoder: hardware candidates when enabled, then the configured codec, then software."""
+    candidates: List[str] = []
+    if use_hardware:
+        candidates += [gpu_codec] if gpu_codec else []
+        candidates += HARDWARE_ENCODERS
+    candidates += [preferred] + SOFTWARE_ENCODERS
+    seen = set()
+    for codec in candidates:
+        if codec in seen:
+            continue
+        seen.add(codec)
+        if encoder_works(codec, cache_path, ttl_seconds):
+            return codec
+    logger.warning(f"No encoder passed its trial encode; using {preferred}")
+    return preferred
+
+
+def is_software_encoder(codec: str) -> bool:
+    return codec in SOFTWARE_ENCODERS or codec.startswith('lib')
+
+
+def quality_args(codec: str, preset: Optional[str], crf: Optional[int]) -> List[str]:
+    """Translate x264-style preset/crf settings into the equivalent options of the chosen encoder."""
+    args: List[str] = []
+    if codec.endswith('_nvenc'):
+        nvenc_presets = {'ultrafast': 'p1', 'superfast': 'p1', 'veryfast': 'p2', 'faster': 'p3', 'fast': 'p3',
+                         'medium': 'p4', 'slow': 'p5', 'slower': 'p6', 'veryslow': 'p7'}
+        if preset in nvenc_presets:
+            args += ['-preset', nvenc_presets[preset]]
+        if crf:
+            args += ['-rc', 'vbr', '-cq', str(crf)]
+    elif codec.endswith('_qsv'):
+        if preset:
+            # QSV accepts x264 names except the two fastest
+            args += ['-preset', 'veryfast' if preset in ('ultrafast', 'superfast') else preset]
+        if crf:
+            args += ['-global_quality', str(crf)]
+    elif codec.endswith('_amf'):
+        if crf:
+            args += ['-rc', 'cqp', '-qp_i', str(crf), '-qp_p', str(crf)]
+    elif codec == 'libopenh264' or codec.endswith('_videotoolbox'):
+        # No preset or CRF mode; these follow -b:v when a bitrate is set
+        pass
+    else:
+        if preset:
+            args += ['-preset', preset]
+        if crf:
+            args += ['-crf', str(crf)]
+    return args
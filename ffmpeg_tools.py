@@ -0,0 +1,326 @@
+"""
+Helpers for running FFmpeg directly, without pulling frames through Python.
+
+Uses the same FFmpeg binary as MoviePy so every encode in a job agrees on
+codec versions and defaults.
+"""
+
+import os
+import math
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from moviepy.config import FFMPEG_BINARY
+
+logger = logging.getLogger(__name__)
+
+
+def run_ffmpeg(args: Sequence[str], progress: Optional[Callable[[int], None]] = None):
+    """Run FFmpeg with the given arguments, raising RuntimeError on failure.
+
+    With a progress callback, FFmpeg's -progress output is read as it runs and
+    the callback receives the number of frames written so far.
+    """
+    cmd = [FFMPEG_BINARY, '-hide_banner', '-nostdin', '-y', '-loglevel', 'error']
+    if progress is not None:
+        cmd.extend(['-progress', 'pipe:1', '-nostats'])
+    cmd.extend(args)
+    logger.debug(f"Running: {' '.join(cmd)}")
+    if progress is None:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        returncode, stderr = result.returncode, result.stderr
+    else:
+        returncode, stderr = _run_with_progress(cmd, progress)
+    if returncode != 0:
+        error_tail = stderr.strip()[-500:]
+        raise RuntimeError(f"FFmpeg exited with code {returncode}: {error_tail}")
+
+
+def _run_with_progress(cmd: List[str], progress: Callable[[int], None]) -> Tuple[int, str]:
+    # stderr goes to a file so a chatty failure cannot block FFmpeg while stdout is being read
+    with tempfile.TemporaryFile(mode='w+') as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        # -progress writes key=value blocks, one about every half second
+        for line in process.stdout:
+            if line.startswith('frame='):
+                try:
+                    progress(int(line[6:]))
+                except ValueError:
+                    pass
+        returncode = process.wait()
+        stderr.seek(0)
+        return returncode, stderr.read()
+
+
+AXIS_KEYWORDS = {
+    'x': {'left': '0', 'center': '(W-w)/2', 'right': 'W-w'},
+    'y': {'top': '0', 'center': '(H-h)/2', 'bottom': 'H-h'}
+}
+
+
+def _axis_expression(value: Union[int, float, str], axis: str) -> str:
+    """Translate a MoviePy-style position component into an overlay expression.
+
+    Only numbers and the axis keywords are accepted: anything else would end up verbatim in -filter_complex.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return str(value)
+    if isinstance(value, str) and value in AXIS_KEYWORDS[axis]:
+        return AXIS_KEYWORDS[axis][value]
+    raise ValueError(f"Invalid {axis} position {value!r}: use a number or one of {', '.join(AXIS_KEYWORDS[axis])}")
+
+
+def overlay_position(position) -> str:
+    """Return the "x:y" overlay arguments for a MoviePy-style position."""
+    if isinstance(position, str):
+        position = (position, position)
+    if not isinstance(position, (list, tuple)) or len(position) != 2:
+        raise ValueError(f"Invalid position {position!r}: use [x, y] or \"center\"")
+    x, y = position
+    return f"{_axis_expression(x, 'x')}:{_axis_expression(y, 'y')}"
+
+
+def logo_filter(logo_config: dict, default_height: int, prepared: bool = False) -> str:
+    """Build the scale/opacity filter chain matching the MoviePy logo preparation.
+
+    Logos coming from the asset cache are already sized and opacity-applied,
+    so they only need converting to RGBA.
+    """
+    if prepared:
+        return 'format=rgba'
+    width = logo_config.get('width')
+    height = logo_config.get('height', default_height)
+    if width and height:
+        scale = f"scale={width}:{height}"
+    elif width:
+        scale = f"scale={width}:-1"
+    else:
+        scale = f"scale=-1:{height}"
+
+    filters = [scale, 'format=rgba']
+    opacity = logo_config.get('opacity', 1.0)
+    if opacity != 1.0:
+        filters.append(f"colorchannelmixer=aa={opacity}")
+    return ','.join(filters)
+
+
+def silence_input(duration: float) -> List[str]:
+    """Input arguments for a silent 44.1 kHz stereo track of the given length."""
+    return ['-f', 'lavfi', '-t', f"{duration:.3f}", '-i', 'anullsrc=r=44100:cl=stereo']
+
+
+def video_encode_args(codec: str, fps: float, extra_args: Optional[List[str]] = None) -> List[str]:
+    """Video encoder arguments equivalent to MoviePy's write_videofile output."""
+    args = ['-c:v', codec]
+    args.extend(extra_args or [])
+    # MoviePy writes frames at a two-decimal rate and yuv420p for x264; match it so segments concat cleanly
+    args.extend(['-r', '%.02f' % fps, '-pix_fmt', 'yuv420p'])
+    return args
+
+
+def render_static_overlay(
+    input_path: str,
+    start: float,
+    end: float,
+    logo_file: str,
+    logo_config: dict,
+    output_path: str,
+    codec: str,
+    audio_codec: str,
+    fps: float,
+    extra_args: Optional[List[str]] = None,
+    prepared: bool = False,
+    include_audio: bool = True,
+    progress: Optional[Callable[[int], None]] = None,
+    source_has_audio: bool = True
+):
+    """Render [start, end) of a video with the static logo overlaid in a single FFmpeg pass.
+
+    With include_audio, the output always gets an audio track: silence when the source has none,
+    so it lines up with MoviePy pieces that carry the animated logo's soundtrack.
+    """
+    filter_graph = (
+        f"[1:v]{logo_filter(logo_config, 80, prepared)}[logo];"
+        f"[0:v][logo]overlay={overlay_position(logo_config.get('position', [20, 20]))}[v]"
+    )
+    silence_args: List[str] = []
+    if include_audio:
+        if not source_has_audio:
+            silence_args = silence_input(end - start)
+        # MoviePy writes the intro and outro as 44.1 kHz stereo; the middle must match for the concat demuxer
+        audio_args = ['-map', '0:a' if source_has_audio else '2:a', '-c:a', audio_codec, '-ar', '44100', '-ac', '2']
+    else:
+        audio_args = ['-an']
+    args = [
+        '-ss', f"{start:.3f}", '-i', input_path,
+        '-i', logo_file,
+        *silence_args,
+        '-t', f"{end - start:.3f}",
+        '-filter_complex', filter_graph,
+        '-map', '[v]',
+        *video_encode_args(codec, fps, extra_args),
+        *audio_args,
+        output_path
+    ]
+    run_ffmpeg(args, progress)
+
+
+def plan_chunk_boundaries(start: float, end: float, chunk_seconds: float, keyframes: List[float]) -> List[float]:
+    """Split [start, end] into roughly chunk_seconds pieces, snapping cuts to the nearest keyframe."""
+    boundaries = [start]
+    target = start + chunk_seconds
+    # Leave out cuts that would produce a sliver shorter than half a chunk at the end
+    while target < end - chunk_seconds / 2:
+        candidates = [k for k in keyframes if boundaries[-1] < k < end]
+        cut = min(candidates, key=lambda k: abs(k - target)) if candidates else target
+        if abs(cut - target) > chunk_seconds / 2:
+            cut = target
+        boundaries.append(cut)
+        target = cut + chunk_seconds
+    boundaries.append(end)
+    return boundaries
+
+
+def render_static_overlay_chunked(
+    input_path: str,
+    boundaries: List[float],
+    logo_file: str,
+    logo_config: dict,
+    output_path: str,
+    codec: str,
+    audio_codec: str,
+    fps: float,
+    work_dir: str,
+    max_workers: int,
+    extra_args: Optional[List[str]] = None,
+    prepared: bool = False,
+    checkpoints=None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    include_audio: bool = True,
+    source_has_audio: bool = True
+):
+    """Render the static-logo segment as parallel video-only chunks, then join them losslessly.
+
+    Audio is encoded once over the whole range while the chunks are joined, so
+    chunk cuts never introduce AAC priming gaps. It is silence when the source
+    has no audio, as in render_static_overlay. With a SegmentCheckpoints
+    object, chunks that are already complete and valid are reused. progress
+    receives (chunk index, frames written) from every chunk encoder.
+    """
+    def render_chunk(index: int, chunk_start: float, chunk_end: float) -> str:
+        name = f"middle_chunk_{index:04d}.mp4"
+
+        def build(chunk_path: str):
+            render_static_overlay(
+                input_path, chunk_start, chunk_end, logo_file, logo_config,
+                chunk_path, codec, audio_codec, fps, extra_args, prepared, False,
+                progress=(lambda frames: progress(index, frames)) if progress is not None else None
+            )
+
+        if checkpoints is not None:
+            return checkpoints.run(name, chunk_end - chunk_start, build)
+        build(os.path.join(work_dir, name))
+        return os.path.join(work_dir, name)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(render_chunk, index, chunk_start, chunk_end)
+            for index, (chunk_start, chunk_end) in enumerate(zip(boundaries, boundaries[1:]))
+        ]
+        chunk_paths = [future.result() for future in futures]
+
+    list_path = write_concat_list(chunk_paths, os.path.join(work_dir, 'middle_chunks.txt'))
+    start, end = boundaries[0], boundaries[-1]
+    if not include_audio:
+        audio_args = ['-an']
+    elif source_has_audio:
+        audio_args = ['-ss', f"{start:.3f}", '-t', f"{end - start:.3f}", '-i', input_path,
+                      '-map', '0:v', '-map', '1:a', '-c:a', audio_codec, '-ar', '44100', '-ac', '2']
+    else:
+        audio_args = [*silence_input(end - start), '-map', '0:v', '-map', '1:a', '-c:a', audio_codec]
+    run_ffmpeg([
+        '-f', 'concat', '-safe', '0', '-i', list_path,
+        *audio_args,
+        '-c:v', 'copy',
+        output_path
+    ])
+
+
+def render_branding_plan(
+    plan: dict,
+    output_path: str,
+    codec: str,
+    audio_codec: str,
+    fps: float,
+    extra_args: Optional[List[str]] = None,
+    progress: Optional[Callable[[int], None]] = None
+):
+    """Render the full branding plan with one FFmpeg filter_complex invocation.
+
+    The static logo is overlaid for the whole video. The animated logo is read
+    twice, the second copy shifted to the outro start, so both windows play it
+    from its first frame as the MoviePy composites do. Each copy is trimmed to
+    its window so it cannot extend the output past the main video.
+    """
+    intro_duration = plan['intro_duration']
+    outro_start = plan['outro_start']
+    outro_duration = plan['outro_duration']
+    static_position = overlay_position(plan['static_config'].get('position', [20, 20]))
+    animated_position = overlay_position(plan['animated_position'])
+    animated_chain = logo_filter(plan['animated_config'], 100, plan['logos_prepared'])
+
+    filter_parts = [
+        f"[1:v]{logo_filter(plan['static_config'], 80, plan['logos_prepared'])}[static]",
+        f"[2:v]trim=duration={intro_duration},{animated_chain}[intro_logo]",
+        f"[3:v]trim=duration={outro_duration},{animated_chain}[outro_logo]",
+        f"[0:v][static]overlay={static_position}[base]",
+        f"[base][intro_logo]overlay={animated_position}:enable='lt(t,{intro_duration})'[intro]",
+        f"[intro][outro_logo]overlay={animated_position}:enable='gte(t,{outro_start:.3f})'[v]"
+    ]
+
+    # MoviePy composites mix the animated logo's soundtrack into intro and outro; do the same
+    audio_map = '0:a?'
+    if plan['animated_has_audio']:
+        if plan['has_audio']:
+            base_audio = '[0:a]'
+        else:
+            filter_parts.append(f"anullsrc=r=44100:cl=stereo,atrim=duration={plan['duration']:.3f}[silence]")
+            base_audio = '[silence]'
+        filter_parts.extend([
+            f"[2:a]atrim=duration={intro_duration}[intro_audio]",
+            f"[3:a]atrim=duration={outro_duration},asetpts=PTS-STARTPTS,"
+            f"adelay={int(outro_start * 1000)}:all=1[outro_audio]",
+            f"{base_audio}[intro_audio][outro_audio]amix=inputs=3:duration=first:normalize=0[a]"
+        ])
+        audio_map = '[a]'
+
+    args = [
+        '-i', plan['video_path'],
+        '-i', plan['static_logo_file'],
+        '-i', plan['animated_logo_file'],
+        '-itsoffset', f"{outro_start:.3f}", '-i', plan['animated_logo_file'],
+        '-filter_complex', ';'.join(filter_parts),
+        '-map', '[v]', '-map', audio_map,
+        *video_encode_args(codec, fps, extra_args),
+        '-c:a', audio_codec,
+        output_path
+    ]
+    run_ffmpeg(args, progress)
+
+
+def write_concat_list(paths: List[str], list_path: str) -> str:
+    """Write a concat demuxer list file for the given media files."""
+    with open(list_path, 'w') as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def concat_segments(segment_paths: List[str], output_path: str, work_dir: str, extra_args: Optional[List[str]] = None):
+    """Join already-encoded segments with the concat demuxer, without re-encoding."""
+    list_path = write_concat_list(segment_paths, os.path.join(work_dir, 'concat_list.txt'))
+    run_ffmpeg(['-f', 'concat', '-safe', '0', '-i', list_path, '-c', 'copy'] + list(extra_args or []) + [output_path])
@@ -0,0 +1,133 @@
+"""
+Detects when files dropped into the input folder have finished being written.
+
+A file is handed on once its size and mtime have stopped changing for a quiet
+period. If the writer closes it (inotify close-write) or renames it into
+place, it is handed on after one confirming poll. When sidecar markers are
+required, "<video><suffix>" (e.g. "clip.mp4.done") must exist as well.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FileReadinessTracker:
+    """Watches pending files on a background thread and reports each one exactly once when complete."""
+
+    def __init__(
+        self,
+        on_ready: Callable[[str], None],
+        quiet_period: float = 2.0,
+        poll_interval: float = 0.5,
+        require_done_marker: bool = False,
+        marker_suffix: str = '.done'
+    ):
+        self.on_ready = on_ready
+        self.quiet_period = quiet_period
+        self.poll_interval = poll_interval
+        self.require_done_marker = require_done_marker
+        self.marker_suffix = marker_suffix
+        self.pending: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the polling thread."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="file-readiness", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop the polling thread."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _stat(self, path: str):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _marker_ok(self, path: str) -> bool:
+        return not self.require_done_marker or os.path.exists(path + self.marker_suffix)
+
+    def is_ready_now(self, path: str, mtime: Optional[float] = None) -> bool:
+        """Return True if an existing file already looks complete (used for the startup scan).
+
+        Pass the mtime when the caller has already stat'ed the file.
+        """
+        if mtime is None:
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                return False
+        return time.time() - mtime >= self.quiet_period and self._marker_ok(path)
+
+    def watch(self, path: str):
+        """Start or refresh tracking of a file that is being written."""
+        current = self._stat(path)
+        if current is None:
+            return
+        with self.lock:
+            entry = self.pending.get(path)
+            if entry is None:
+                self.pending[path] = {'stat': current, 'changed_at': time.monotonic(), 'closed': False}
+                logger.debug(f"Waiting for {path} to finish writing")
+            elif entry['stat'] != current:
+                entry.update(stat=current, changed_at=time.monotonic(), closed=False)
+
+    def mark_closed(self, path: str):
+        """The writer closed the file or renamed it into place; confirm on the next poll."""
+        current = self._stat(path)
+        if current is None:
+            return
+        with self.lock:
+            entry = self.pending.setdefault(path, {'changed_at': time.monotonic()})
+            entry.update(stat=current, closed=True)
+
+    def marker_seen(self, marker_path: str):
+        """A sidecar marker appeared; re-check its video right away."""
+        if marker_path.endswith(self.marker_suffix):
+            self.mark_closed(marker_path[:-len(self.marker_suffix)])
+
+    def _run(self):
+        while not self.stop_event.wait(self.poll_interval):
+            for path in self._collect_ready():
+                if self.require_done_marker:
+                    try:
+                        os.remove(path + self.marker_suffix)
+                    except OSError:
+                        pass
+                try:
+                    self.on_ready(path)
+                except Exception as e:
+                    logger.error(f"Failed to hand off ready file {path}: {e}")
+
+    def _collect_ready(self):
+        """Update pending entries and remove and return those that are complete."""
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            for path, entry in list(self.pending.items()):
+                current = self._stat(path)
+                if current is None:
+                    # Deleted or moved away before it finished
+                    del self.pending[path]
+                    continue
+                if current != entry['stat']:
+                    entry.update(stat=current, changed_at=now, closed=False)
+                    continue
+                settled = entry['closed'] or now - entry['changed_at'] >= self.quiet_period
+                if settled and self._marker_ok(path):
+                    del self.pending[path]
+                    ready.append(path)
+        return ready
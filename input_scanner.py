@@ -0,0 +1,104 @@
+"""
+Batched discovery of backlog files in the input folders.
+
+os.scandir returns file types from the directory listing itself, so only
+video files are stat'ed. Entries are yielded in batches, which lets the
+caller enqueue each batch in a single job store transaction instead of one
+per file. Each entry carries the (inode, size, mtime) identity the job store
+uses to skip file versions it has already handled, and a priority that
+fixes the order the backlog is worked through.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_ORDERS = ('fifo', 'oldest', 'smallest', 'deadline')
+# Priority base for files without a deadline: far beyond any real deadline, so they run after those that have one
+NO_DEADLINE = 1e11
+
+
+class ScanEntry(NamedTuple):
+    path: str
+    inode: int
+    size: int
+    mtime: float
+
+
+def scan_videos(directory: str, is_video: Callable[[str], bool], batch_size: int = 1000,
+                recursive: bool = False) -> Iterator[List[ScanEntry]]:
+    """Yield the video files in directory (and its subfolders when recursive), batch_size entries at a time.
+
+    Hidden folders such as .partial are skipped.
+    """
+    batch: List[ScanEntry] = []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if recursive and not entry.name.startswith('.'):
+                        pending.append(entry.path)
+                    continue
+                if not is_video(entry.name) or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                batch.append(ScanEntry(entry.path, stat.st_ino, stat.st_size, stat.st_mtime))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def in_hidden_folder(path: str, roots: Iterable[str], is_directory: bool = False) -> bool:
+    """True if path lies in (or, for a directory, is) a hidden folder below the watch root holding it.
+
+    These are the folders scan_videos skips, such as input/.uploads and input/.leases.
+    """
+    path = os.path.abspath(path)
+    for root in sorted((os.path.abspath(root) for root in roots), key=len, reverse=True):
+        parts = os.path.relpath(path, root).split(os.sep)
+        if parts[0] == os.pardir:
+            continue
+        folders = parts if is_directory else parts[:-1]
+        return any(part.startswith('.') and part != os.curdir for part in folders)
+    return False
+
+
+def read_deadline(path: str, suffix: str) -> Optional[float]:
+    """Return the deadline from a <video><suffix> sidecar (ISO 8601 or Unix time), or None if there is none."""
+    try:
+        with open(f"{path}{suffix}") as f:
+            text = f.read().strip()
+    except OSError:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        logger.warning(f"Ignoring unreadable deadline {text!r} for {path}")
+        return None
+
+
+def job_priority(entry: ScanEntry, order: str, deadline_suffix: str = '.deadline') -> float:
+    """Sort key for a queued file; lower runs first. 'fifo' keeps discovery order."""
+    if order == 'oldest':
+        return entry.mtime
+    if order == 'smallest':
+        return float(entry.size)
+    if order == 'deadline':
+        deadline = read_deadline(entry.path, deadline_suffix)
+        # Files without a deadline follow every file that has one, oldest first
+        return deadline if deadline is not None else NO_DEADLINE + entry.mtime
+    return 0.0
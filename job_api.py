@@ -0,0 +1,415 @@
+"""
+HTTP API for submitting jobs and following them.
+
+A small HTTP/1.1 server on asyncio, running its own event loop in a
+background thread next to the processor. It uses only the standard library.
+Each request is answered on its own connection.
+
+- POST /jobs with a JSON body {"path": ..., "settings": {...}} queues a file
+  that is already in an input folder.
+- POST /jobs?filename=clip.mp4[&profile=name][&settings=<json>] with the
+  video as the request body uploads the file into the profile's input folder
+  and queues it.
+- GET /jobs/<id> returns the job's state and encode progress.
+- GET /jobs/<id>/events streams the job's state changes and progress as
+  server-sent events until the job is done or has failed.
+
+"settings" holds per-job overrides, merged over the profile's settings for
+that job only. Only the render settings listed in JOB_OVERRIDE_KEYS can be
+overridden, and each value must pass its check (type and range). Paths (logo
+files, caches, folders), cluster, API and other process-wide settings cannot.
+"""
+
+import os
+import re
+import json
+import uuid
+import asyncio
+import logging
+import threading
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from profiles import DEFAULT_PROFILE, deep_merge
+from ffmpeg_tools import overlay_position
+
+logger = logging.getLogger(__name__)
+
+BITRATE_PATTERN = re.compile(r'^\d+(\.\d+)?[kKmM]?$')
+X264_PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow')
+
+
+def _number(low: float, high: float, integer: bool = False) -> Callable[[Any], bool]:
+    types = (int,) if integer else (int, float)
+    return lambda value: isinstance(value, types) and not isinstance(value, bool) and low <= value <= high
+
+
+def _optional(check: Callable[[Any], bool]) -> Callable[[Any], bool]:
+    return lambda value: value is None or check(value)
+
+
+def _bitrate(value: Any) -> bool:
+    return isinstance(value, str) and BITRATE_PATTERN.match(value) is not None
+
+
+def _position(value: Any) -> bool:
+    try:
+        overlay_position(value)
+    except (ValueError, TypeError):
+        return False
+    return True
+
+
+def _crf_range(value: Any) -> bool:
+    crf = _number(0, 51, integer=True)
+    return isinstance(value, list) and len(value) == 2 and crf(value[0]) and crf(value[1]) and value[0] <= value[1]
+
+
+# Settings a job may override, by section, each with the check its value must pass. None of them names a file or folder.
+LOGO_OVERRIDE_KEYS = {
+    'height': _number(1, 4096, integer=True),
+    'width': _number(1, 4096, integer=True),
+    'position': _position,
+    'bottom_margin': _number(0, 4096),
+    'opacity': _number(0, 1),
+    'scale_factor': _number(0.01, 10)
+}
+JOB_OVERRIDE_KEYS = {
+    'video_processing': {
+        'intro_duration': _number(0, 3600),
+        'outro_duration': _number(0, 3600),
+        'min_video_duration': _number(0, 86400)
+    },
+    'logo_configuration': {'static_logo': LOGO_OVERRIDE_KEYS, 'animated_logo': LOGO_OVERRIDE_KEYS},
+    'output_settings': {
+        'preset': lambda value: value in X264_PRESETS,
+        'crf': _number(0, 51, integer=True),
+        'bitrate': _optional(_bitrate),
+        'audio_bitrate': _optional(_bitrate),
+        'fps': _optional(_number(1, 240))
+    },
+    'encode_tuning': {
+        'enabled': lambda value: isinstance(value, bool),
+        'target_ssim': _number(0, 1),
+        'max_bitrate_kbps': _optional(_number(1, 1000000)),
+        'crf_range': _crf_range
+    }
+}
+FINAL_STATES = ('done', 'failed')
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# SSE comment sent while a job is idle, so proxies do not drop the stream
+KEEPALIVE_SECONDS = 15
+
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str, job: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status = status
+        self.job = job
+
+
+def override_errors(overrides: Dict[str, Any], allowed=JOB_OVERRIDE_KEYS, prefix: str = '') -> List[str]:
+    """Describe every key in overrides that JOB_OVERRIDE_KEYS does not allow or whose value fails its check."""
+    errors = []
+    for key, value in overrides.items():
+        name = f"{prefix}{key}"
+        rule = allowed.get(key)
+        if rule is None:
+            errors.append(f"{name} cannot be overridden per job")
+        elif isinstance(rule, dict):
+            if isinstance(value, dict):
+                errors += override_errors(value, rule, f"{name}.")
+            else:
+                errors.append(f"{name} must be an object")
+        elif not rule(value):
+            errors.append(f"{name} has an invalid value {json.dumps(value)}")
+    return errors
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public fields of a job row."""
+    return {key: job.get(key) for key in (
+        'id', 'path', 'state', 'attempts', 'error', 'priority', 'overrides', 'progress',
+        'created_at', 'started_at', 'finished_at', 'updated_at'
+    )}
+
+
+class JobApiServer:
+    """Serves the job API for a VideoProcessor from a background thread."""
+
+    def __init__(self, processor, host: str = '127.0.0.1', port: int = 9109, token: Optional[str] = None,
+                 max_upload_mb: float = 4096, event_poll_seconds: float = 0.5):
+        self.processor = processor
+        self.host = host
+        self.port = port
+        self.token = token
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024) if max_upload_mb else None
+        self.event_poll_seconds = event_poll_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.thread: Optional[threading.Thread] = None
+        self.ready = threading.Event()
+        self.start_error: Optional[BaseException] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="job-api", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.start_error is not None:
+            raise self.start_error
+        host, port = self.server.sockets[0].getsockname()[:2]
+        logger.info(f"Job API listening on http://{host}:{port}/jobs")
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        except BaseException as e:
+            self.start_error = e
+            self.ready.set()
+            self.loop.close()
+            return
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            # Open event streams would otherwise keep their tasks pending
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    async def _call(self, function, *args):
+        """Run blocking work (job store queries, enqueueing) off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            lines = head.decode('latin-1').split('\r\n')
+            try:
+                method, target, _ = lines[0].split(' ', 2)
+            except ValueError:
+                await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'malformed request line'})
+                return
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+            logger.debug(f"Job API request: {method} {url.path}")
+            try:
+                await self._route(method, url.path.rstrip('/'), parse_qs(url.query), headers, reader, writer)
+            except ApiError as e:
+                body = {'error': str(e)}
+                if e.job is not None:
+                    body['job'] = job_view(e.job)
+                await self._respond(writer, e.status, body)
+            except Exception as e:
+                logger.error(f"Job API request {method} {url.path} failed: {e}")
+                await self._respond(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, query: Dict[str, list], headers: Dict[str, str],
+                     reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self.token and headers.get('authorization') != f"Bearer {self.token}":
+            raise ApiError(HTTPStatus.UNAUTHORIZED, 'missing or wrong bearer token')
+        parts = path.strip('/').split('/')
+        if parts[0] != 'jobs' or len(parts) > 3:
+            raise ApiError(HTTPStatus.NOT_FOUND, 'not found')
+        if len(parts) == 1:
+            if method != 'POST':
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, 'use POST to submit a job')
+            job = await self._submit(query, headers, reader)
+            await self._respond(writer, HTTPStatus.CREATED, job_view(job))
+            return
+        if method != 'GET':
+            raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, 'use GET to read a job')
+        job_id = self._job_id(parts[1])
+        if len(parts) == 3 and parts[2] == 'events':
+            await self._stream_events(writer, job_id)
+        elif len(parts) == 2:
+            await self._respond(writer, HTTPStatus.OK, job_view(await self._get_job(job_id)))
+        else:
+            raise ApiError(HTTPStatus.NOT_FOUND, 'not found')
+
+    @staticmethod
+    def _job_id(text: str) -> int:
+        try:
+            return int(text)
+        except ValueError:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no job {text!r}")
+
+    async def _get_job(self, job_id: int) -> Dict[str, Any]:
+        job = await self._call(self.processor.get_job_store().get, job_id)
+        if job is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"no job {job_id}")
+        return job
+
+    async def _submit(self, query: Dict[str, list], headers: Dict[str, str],
+                      reader: asyncio.StreamReader) -> Dict[str, Any]:
+        length = headers.get('content-length')
+        if length is None or not length.isdigit():
+            raise ApiError(HTTPStatus.LENGTH_REQUIRED, 'Content-Length is required')
+        length = int(length)
+        if headers.get('content-type', '').split(';')[0].strip() == 'application/json':
+            try:
+                request = json.loads(await reader.readexactly(length))
+            except ValueError as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}")
+            if not isinstance(request, dict) or not isinstance(request.get('path'), str):
+                raise ApiError(HTTPStatus.BAD_REQUEST, 'body must be an object with a "path"')
+            video_path = self._input_path(request['path'])
+            overrides = self._check_overrides(video_path, request.get('settings'))
+            job_id = await self._call(self.processor.enqueue_video, video_path, overrides)
+        else:
+            filename = os.path.basename(query.get('filename', [''])[0])
+            if not filename or filename.startswith('.') or not self.processor.is_video_file(filename):
+                raise ApiError(HTTPStatus.BAD_REQUEST, 'filename must name a video file')
+            input_dir = self._profile_input_dir(query.get('profile', [DEFAULT_PROFILE])[0])
+            # Same form as _input_path, so the job store matches the path the watcher and scans report
+            video_path = os.path.relpath(os.path.abspath(os.path.join(input_dir, filename)))
+            try:
+                settings = json.loads(query['settings'][0]) if 'settings' in query else None
+            except ValueError as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"invalid settings JSON: {e}")
+            overrides = self._check_overrides(video_path, settings)
+            staging_path = await self._receive_upload(reader, length, video_path)
+            job_id = await self._call(self._publish_upload, staging_path, video_path, overrides)
+
+        if job_id is None:
+            raise ApiError(HTTPStatus.CONFLICT, f"{video_path} is already queued, running or processed",
+                           job=await self._call(self.processor.get_job_store().find, video_path))
+        return await self._get_job(job_id)
+
+    def _input_path(self, path: str) -> str:
+        """Normalise a submitted path; it must be an existing video inside one of the input folders."""
+        absolute = os.path.abspath(path)
+        roots = [os.path.abspath(root) for root in self.processor.profiles.watch_roots()]
+        if not any(os.path.commonpath([absolute, root]) == root for root in roots):
+            raise ApiError(HTTPStatus.FORBIDDEN, f"{path} is not inside an input folder")
+        if not os.path.isfile(absolute) or not self.processor.is_video_file(absolute):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{path} is not a video file")
+        # Same form as the paths found by the scan and the watcher, so the job store sees duplicates
+        return os.path.relpath(absolute)
+
+    def _profile_input_dir(self, name: str) -> str:
+        try:
+            return self.processor.profiles.get(name)['input_dir']
+        except StopIteration:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"unknown profile {name!r}")
+
+    def _check_overrides(self, video_path: str, overrides: Any) -> Optional[Dict[str, Any]]:
+        if not overrides:
+            return None
+        if not isinstance(overrides, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, 'settings must be an object')
+        errors = override_errors(overrides)
+        if errors:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"invalid settings: {'; '.join(errors)}")
+        try:
+            self.processor.validate_settings(deep_merge(self.processor.profiles.resolve(video_path)['settings'], overrides))
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+        return overrides
+
+    async def _receive_upload(self, reader: asyncio.StreamReader, length: int, video_path: str) -> str:
+        """Stream the request body to a hidden staging file and return its path."""
+        if self.max_upload_bytes is not None and length > self.max_upload_bytes:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"upload exceeds {self.max_upload_bytes} bytes")
+        if os.path.exists(video_path):
+            raise ApiError(HTTPStatus.CONFLICT, f"{video_path} already exists")
+        # Hidden folders are skipped by the scan, and .part files are not videos to the watcher
+        staging_dir = os.path.join(os.path.dirname(video_path), '.uploads')
+        os.makedirs(staging_dir, exist_ok=True)
+        staging_path = os.path.join(staging_dir, f"{uuid.uuid4().hex}.part")
+        try:
+            # Disk writes go to the executor so a slow disk does not stall the other connections
+            f = await self._call(open, staging_path, 'wb')
+            try:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(remaining, UPLOAD_CHUNK_BYTES))
+                    if not chunk:
+                        raise ApiError(HTTPStatus.BAD_REQUEST, 'upload ended early')
+                    await self._call(f.write, chunk)
+                    remaining -= len(chunk)
+            finally:
+                await self._call(f.close)
+        except BaseException:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            raise
+        return staging_path
+
+    def _publish_upload(self, staging_path: str, video_path: str, overrides: Optional[Dict[str, Any]]) -> Optional[int]:
+        """Move a complete upload into the input folder and queue it with its overrides. Returns the job id.
+
+        The watcher and scans skip the file until it is queued, so they cannot queue it first without the overrides.
+        """
+        try:
+            with self.processor.hold_from_detection(video_path):
+                if os.path.exists(video_path):
+                    raise ApiError(HTTPStatus.CONFLICT, f"{video_path} already exists")
+                os.replace(staging_path, video_path)
+                logger.info(f"Received upload {video_path} ({os.path.getsize(video_path)} bytes)")
+                return self.processor.enqueue_video(video_path, overrides)
+        finally:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, job_id: int):
+        """Send the job as an SSE event whenever it changes, until it reaches a final state.
+
+        The event is named after the new state, or "progress" when only the progress moved.
+        """
+        job = await self._get_job(job_id)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        last: Optional[Tuple] = None
+        progress = None
+        idle = 0.0
+        while True:
+            snapshot = (job['state'], job['attempts'], job['updated_at'])
+            if snapshot != last or job['progress'] != progress:
+                event = job['state'] if snapshot != last else 'progress'
+                last, progress = snapshot, job['progress']
+                idle = 0.0
+                writer.write(f"event: {event}\ndata: {json.dumps(job_view(job))}\n\n".encode())
+            elif idle >= KEEPALIVE_SECONDS:
+                idle = 0.0
+                writer.write(b": keepalive\n\n")
+            await writer.drain()
+            if job['state'] in FINAL_STATES:
+                return
+            await asyncio.sleep(self.event_poll_seconds)
+            idle += self.event_poll_seconds
+            job = await self._call(self.processor.get_job_store().get, job_id)
+            if job is None:
+                # Dropped because another cluster node took the file
+                return
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: HTTPStatus, body: Dict[str, Any]):
+        payload = json.dumps(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
@@ -0,0 +1,256 @@
+"""
+Durable job queue backed by SQLite in WAL mode.
+
+Every discovered video becomes a row that moves through
+queued -> running -> done/failed. Claims happen inside an IMMEDIATE
+transaction, so two dispatchers never start the same job. Queued jobs are
+claimed in priority order, then in the order they were found. A partial unique
+index allows only one active job per path. A file version is identified by
+its (inode, size, mtime); a version that is already done or failed is not
+queued again. After a crash, jobs left in "running" go back to the queue on
+the next start. A job may carry settings overrides (JSON) that apply to that
+job only. While a job runs, the process rendering it stores its latest encode
+progress (JSON) on the row.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    file_size INTEGER,
+    file_mtime REAL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_one_active_per_path
+    ON jobs(path) WHERE state IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, id);
+"""
+
+# Columns added after the first release; older databases get them on open
+ADDED_COLUMNS = {
+    'file_inode': 'INTEGER',
+    'priority': 'REAL NOT NULL DEFAULT 0',
+    'overrides': 'TEXT',
+    'progress': 'TEXT'
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs(state, priority, id);
+CREATE INDEX IF NOT EXISTS jobs_path ON jobs(path, file_size, file_mtime);
+"""
+
+# (path, inode, size, mtime, priority)
+FileVersion = Tuple[str, int, int, float, float]
+
+
+def _job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    for column in ('overrides', 'progress'):
+        job[column] = json.loads(job[column]) if job.get(column) else None
+    return job
+
+
+class JobStore:
+    """Crash-safe job queue shared by the watcher, the startup scan and the dispatcher."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, declaration in ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {declaration}")
+        conn.executescript(INDEXES)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _insert(self, conn: sqlite3.Connection, version: FileVersion, now: float,
+                overrides: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Queue one file version inside the caller's transaction; None if it is active or was handled."""
+        path, inode, size, mtime, priority = version
+        handled = conn.execute(
+            "SELECT 1 FROM jobs WHERE path = ? AND file_size = ? AND file_mtime = ? "
+            "AND (file_inode IS NULL OR file_inode = ?) AND state IN (?, ?)",
+            (path, size, mtime, inode, DONE, FAILED)
+        ).fetchone()
+        if handled:
+            return None
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO jobs (path, file_inode, file_size, file_mtime, priority, overrides, state, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, inode, size, mtime, priority, json.dumps(overrides) if overrides else None, QUEUED, now, now)
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def enqueue(self, path: str, priority: float = 0.0, overrides: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Queue a file. Returns the job id, or None if it is already active or this version was handled."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return self._transaction(
+            lambda conn, now: self._insert(
+                conn, (path, stat.st_ino, stat.st_size, stat.st_mtime, priority), now, overrides
+            )
+        )
+
+    def enqueue_many(self, versions: Iterable[FileVersion]) -> int:
+        """Queue a batch of already stat'ed files in one transaction. Returns how many were new."""
+        return self._transaction(
+            lambda conn, now: sum(1 for version in versions if self._insert(conn, version, now) is not None)
+        )
+
+    def _transaction(self, body):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = body(conn, time.time())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the first queued job (lowest priority value, then oldest) to running and return it."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE state = ? ORDER BY priority, id LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, worker = ?, progress = NULL, started_at = ?, "
+                "updated_at = ? WHERE id = ?",
+                (RUNNING, worker, now, now, row['id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = _job(row)
+        job.update(state=RUNNING, attempts=row['attempts'] + 1, worker=worker, progress=None, started_at=now)
+        return job
+
+    def _finish(self, job_id: int, state: str, error: Optional[str] = None):
+        now = time.time()
+        self._connect().execute(
+            "UPDATE jobs SET state = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+            (state, error, now, now, job_id)
+        )
+
+    def set_progress(self, path: str, progress: Dict[str, Any]):
+        """Store the encode progress of the running job for path."""
+        self._connect().execute(
+            "UPDATE jobs SET progress = ? WHERE path = ? AND state = ?", (json.dumps(progress), path, RUNNING)
+        )
+
+    def mark_done(self, job_id: int):
+        """Record a successfully processed job."""
+        self._finish(job_id, DONE)
+
+    def mark_failed(self, job_id: int, error: str):
+        """Record a job that will not be retried automatically."""
+        self._finish(job_id, FAILED, error=error)
+
+    def requeue(self, job_id: int, error: str):
+        """Put a job that failed after it left the worker back in the queue for another attempt."""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE jobs SET state = ?, error = ?, worker = NULL, updated_at = ? WHERE id = ?",
+            (QUEUED, error, now, job_id)
+        )
+
+    def forget(self, job_id: int):
+        """Drop a job this node will not run (another cluster node holds the file), so a later scan can queue it again."""
+        self._connect().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def recover_interrupted(self, max_attempts: int) -> int:
+        """Requeue jobs left running by a crash; give up on ones that keep dying. Returns jobs requeued."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT id, path, attempts FROM jobs WHERE state = ?", (RUNNING,)).fetchall()
+            now = time.time()
+            requeued = 0
+            for row in rows:
+                if not os.path.exists(row['path']):
+                    state, error = FAILED, "Input file no longer exists after restart"
+                elif row['attempts'] >= max_attempts:
+                    state, error = FAILED, f"Interrupted {row['attempts']} time(s)"
+                else:
+                    state, error = QUEUED, None
+                    requeued += 1
+                conn.execute(
+                    "UPDATE jobs SET state = ?, error = ?, worker = NULL, updated_at = ? WHERE id = ?",
+                    (state, error, now, row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if rows:
+            logger.info(f"Recovered {len(rows)} interrupted job(s), {requeued} requeued")
+        return requeued
+
+    def queued_paths(self, limit: int = -1) -> List[str]:
+        """Return the paths of queued jobs in the order they will be claimed."""
+        rows = self._connect().execute(
+            "SELECT path FROM jobs WHERE state = ? ORDER BY priority, id LIMIT ?", (QUEUED, limit)
+        ).fetchall()
+        return [row['path'] for row in rows]
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Return a job by id, or None."""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row is not None else None
+
+    def find(self, path: str) -> Optional[Dict[str, Any]]:
+        """Return the most recent job for a path, or None."""
+        row = self._connect().execute(
+            "SELECT * FROM jobs WHERE path = ? ORDER BY id DESC LIMIT 1", (path,)
+        ).fetchone()
+        return _job(row) if row is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of jobs in each state."""
+        rows = self._connect().execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        return {row['state']: row['n'] for row in rows}
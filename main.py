@@ -3,15 +3,38 @@ import json
 import time
 import logging
 import shutil
-import psutil
+import socket
+import uuid
+import functools
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from moviepy import VideoFileClip, ImageClip, CompositeVideoClip, concatenate_videoclips
 import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime
-import gc
+from worker_pool import WorkerPool, resolve_pool_size
+import ffmpeg_tools
+import encoder_probe
+from asset_cache import LogoAssetCache, logo_target_size
+from output_cache import OutputCache, content_hash, settings_hash, link_or_copy
+from video_probe import probe_video, keyframe_times
+from job_store import JobStore
+from file_readiness import FileReadinessTracker
+from input_scanner import ScanEntry, scan_videos, job_priority, in_hidden_folder
+from profiles import ProfileResolver, deep_merge
+from cluster_lease import LeaseManager, LeaseLost
+from dispatch_queue import DispatchQueue
+from metrics import JobMetrics, MetricsRegistry, MetricsServer
+from job_api import JobApiServer
+from progress import ProgressTracker, FrameProgressLogger
+from encode_tuner import EncodeTuner
+from segment_checkpoints import SegmentCheckpoints, checkpoint_dir_name, remove_stale as remove_stale_checkpoints
+from segment_checkpoints import fingerprint as segment_fingerprint
+from memory_admission import MemoryAdmissionController, estimate_job_memory_mb
+from output_validator import validate_output
 
 # Configure logging
 logging.basicConfig(
@@ -25,28 +48,95 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class VideoProcessor:
-    def __init__(self):
+    def __init__(self, lease_node: Optional[str] = None):
+        self.profile_local = threading.local()
         self.settings = self.load_settings()
-        self.setup_directories()
-        self.check_assets()
-        self.processed_files = set()
+        self.profiles = ProfileResolver(self.settings)
+        for profile in self.profiles.profiles:
+            with self.profile_settings(profile['settings']):
+                self.validate_settings(self.settings)
+                self.setup_directories()
+                self.check_assets()
         self.processing_lock = threading.Lock()
+        self.worker_pool = None
+        self.job_store = None
+        self.readiness_tracker = None
+        self.dispatcher = None
+        self.pool_lock = threading.Lock()
+        self.node_name = self.settings.get('cluster', {}).get('node_name') or socket.gethostname()
+        self.worker_id = f"{self.node_name}:{os.getpid()}"
+        self.leases = None
+        # Pool workers publish on behalf of the dispatching node and check its leases read-only
+        self.lease_node = lease_node
+        self.lease_view = None
+        self.rescan_stop = threading.Event()
+        self.rescan_thread = None
+        # Cache instances by folder (and size limit), since profiles and overrides may point at different ones
+        self.asset_caches = {}
+        self.output_caches = {}
+        self.admission = None
+        self.encoders = {}
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        self.api_server = None
+        self.job_metrics = None
+        self.last_job_metrics = None
+        self.last_output = None
+        self.progress = None
+        self.validation_executor = None
+        self.pending_validations = set()
+        self.held_paths = set()
         self.setup_logging()
         
+    @property
+    def settings(self) -> dict:
+        """Settings of the profile the current thread is working for, or the base settings."""
+        return getattr(self.profile_local, 'settings', None) or self.base_settings
+    
+    @settings.setter
+    def settings(self, value: dict):
+        self.base_settings = value
+    
+    @contextmanager
+    def profile_settings(self, settings: dict):
+        """Make self.settings return the given profile's settings in this thread for the block."""
+        previous = getattr(self.profile_local, 'settings', None)
+        self.profile_local.settings = settings
+        try:
+            yield
+        finally:
+            self.profile_local.settings = previous
+    
+    def use_profile(self, video_path: str, overrides: Optional[dict] = None):
+        """Apply the branding profile that owns video_path, plus any per-job overrides, for the block."""
+        settings = self.profiles.resolve(video_path)['settings']
+        if overrides:
+            settings = deep_merge(settings, overrides)
+        return self.profile_settings(settings)
+    
+    def get_dir(self, key: str, default: str) -> str:
+        """Input, output or processed folder of the current profile."""
+        return self.settings.get('file_management', {}).get(key, default)
+    
     def get_unique_processed_path(self, video_path: str) -> str:
-        """Return a collision-safe path within processed/ for the given file."""
+        """Return a collision-safe path within the processed folder for the given file."""
+        processed_dir = Path(self.get_dir('processed_dir', 'processed'))
         original_name = Path(video_path).name
-        base = Path("processed") / original_name
+        base = processed_dir / original_name
         if not base.exists():
             return str(base)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        candidate = Path("processed") / f"{Path(original_name).stem}_{timestamp}{Path(original_name).suffix}"
+        candidate = processed_dir / f"{Path(original_name).stem}_{timestamp}{Path(original_name).suffix}"
         counter = 1
         while candidate.exists():
-            candidate = Path("processed") / f"{Path(original_name).stem}_{timestamp}_{counter}{Path(original_name).suffix}"
+            candidate = processed_dir / f"{Path(original_name).stem}_{timestamp}_{counter}{Path(original_name).suffix}"
             counter += 1
         return str(candidate)
 
+    def move_to_processed(self, video_path: str, processed_path: str):
+        """Move an input into the processed folder, copying when the two are on different filesystems."""
+        shutil.move(video_path, processed_path)
+
     def setup_logging(self):
         """Configure logging based on settings."""
         log_level = getattr(logging, self.settings.get('advanced_settings', {}).get('log_level', 'INFO'))
@@ -54,7 +144,8 @@ class VideoProcessor:
         
     def setup_directories(self):
         """Create necessary directories if they don't exist."""
-        directories = ["input", "output", "processed"]
+        directories = [self.get_dir('input_dir', 'input'), self.get_dir('output_dir', 'output'),
+                       self.get_dir('processed_dir', 'processed')]
         temp_dir = self.settings.get('video_processing', {}).get('temp_dir', 'temp')
         if temp_dir:
             directories.append(temp_dir)
@@ -81,14 +172,7 @@ class VideoProcessor:
             with open("settings.json", "r") as f:
                 settings = json.load(f)
             
-            # Validate required settings
-            video_processing = settings.get('video_processing', {})
-            required_keys = ["intro_duration", "outro_duration"]
-            for key in required_keys:
-                if key not in video_processing:
-                    raise ValueError(f"Missing required setting: video_processing.{key}")
-                if not isinstance(video_processing[key], (int, float)) or video_processing[key] < 0:
-                    raise ValueError(f"Invalid value for video_processing.{key}: must be a positive number")
+            self.validate_settings(settings)
             
             logger.info(f"Settings loaded successfully")
             return settings
@@ -96,33 +180,39 @@ class VideoProcessor:
             logger.error(f"Failed to load settings: {e}")
             raise
     
-    def check_memory_usage(self):
-        """Check memory usage against configured limits and throttle if needed."""
-        performance_settings = self.settings.get('performance_settings', {})
-        memory_limit_mb = performance_settings.get('memory_limit_mb', 2048)
-        vm = psutil.virtual_memory()
-        available_mb = vm.available / (1024 * 1024)
-        if vm.percent > 90:
-            logger.warning(f"High system memory usage detected: {vm.percent}% - triggering GC")
-            gc.collect()
-        if available_mb < memory_limit_mb:
-            logger.warning(
-                f"Available memory is low: {available_mb:.0f}MB < configured limit {memory_limit_mb}MB. Throttling for 5s."
-            )
-            time.sleep(5)
+    def validate_settings(self, settings: dict):
+        """Check the required settings of the base configuration or a profile."""
+        video_processing = settings.get('video_processing', {})
+        required_keys = ["intro_duration", "outro_duration"]
+        for key in required_keys:
+            if key not in video_processing:
+                raise ValueError(f"Missing required setting: video_processing.{key}")
+            if not isinstance(video_processing[key], (int, float)) or video_processing[key] < 0:
+                raise ValueError(f"Invalid value for video_processing.{key}: must be a positive number")
+    
+    def get_admission_controller(self) -> MemoryAdmissionController:
+        """Return the controller that admits jobs within memory_limit_mb."""
+        with self.pool_lock:
+            if self.admission is None:
+                performance_settings = self.settings.get('performance_settings', {})
+                self.admission = MemoryAdmissionController(
+                    budget_mb=performance_settings.get('memory_limit_mb', 2048),
+                    system_reserve_mb=performance_settings.get('system_memory_reserve_mb', 256)
+                )
+            return self.admission
+    
+    def estimate_job_memory(self, video_path: str) -> float:
+        """Projected peak memory of a job in MB; unreadable files get the bare per-job overhead."""
+        with self.use_profile(video_path):
+            try:
+                return estimate_job_memory_mb(self.get_video_info(video_path), self.settings)
+            except Exception:
+                return self.settings.get('performance_settings', {}).get('job_memory_overhead_mb', 200)
     
     def get_video_info(self, video_path: str) -> dict:
-        """Get video metadata."""
+        """Get video metadata from a header probe (cached per file version)."""
         try:
-            clip = VideoFileClip(video_path)
-            info = {
-                'duration': clip.duration,
-                'size': clip.size,
-                'fps': clip.fps,
-                'audio': clip.audio is not None
-            }
-            clip.close()
-            return info
+            return probe_video(video_path)
         except Exception as e:
             logger.error(f"Failed to get video info for {video_path}: {e}")
             raise
@@ -133,40 +223,396 @@ class VideoProcessor:
         return Path(file_path).suffix.lower() in video_extensions
     
     def get_output_filename(self, video_path: str) -> str:
-        """Generate output filename based on settings."""
+        """Generate output filename based on settings, under the input's subfolder path mirrored into output/."""
         input_filename = Path(video_path).stem
         naming_convention = self.settings.get('file_management', {}).get('output_naming', 'timestamp')
+        output_dir = self.get_dir('output_dir', 'output')
+        # Same-named videos in different subfolders must not end up at the same output path
+        subfolder = os.path.relpath(os.path.dirname(os.path.abspath(video_path)),
+                                    os.path.abspath(self.get_dir('input_dir', 'input')))
+        if subfolder != '.' and not subfolder.startswith('..'):
+            output_dir = os.path.join(output_dir, subfolder)
+            os.makedirs(output_dir, exist_ok=True)
         
         if naming_convention == 'timestamp':
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            return f"output/{input_filename}_branded_{timestamp}.mp4"
+            return os.path.join(output_dir, f"{input_filename}_branded_{timestamp}.mp4")
         elif naming_convention == 'sequential':
             # Find next available number
             counter = 1
-            while os.path.exists(f"output/{input_filename}_branded_{counter:03d}.mp4"):
+            while os.path.exists(os.path.join(output_dir, f"{input_filename}_branded_{counter:03d}.mp4")):
                 counter += 1
-            return f"output/{input_filename}_branded_{counter:03d}.mp4"
+            return os.path.join(output_dir, f"{input_filename}_branded_{counter:03d}.mp4")
         else:
-            return f"output/{input_filename}_branded.mp4"
+            return os.path.join(output_dir, f"{input_filename}_branded.mp4")
     
-    def cleanup_temp_files(self):
-        """Clean up temporary files if enabled."""
+    def get_partial_path(self, output_filename: str) -> str:
+        """Path to render into: output/.partial/ is on the same filesystem, so publishing is an atomic rename.
+        
+        Each attempt gets its own name, so jobs whose outputs share a file name never render into the same file.
+        """
+        partial_dir = self.get_partial_dir(self.get_dir('output_dir', 'output'))
+        os.makedirs(partial_dir, exist_ok=True)
+        return os.path.join(partial_dir, f"{uuid.uuid4().hex[:12]}_{os.path.basename(output_filename)}")
+    
+    def get_partial_dir(self, output_dir: str) -> str:
+        """output/.partial/, with one subfolder per node in cluster mode so nodes never clean up each other's renders."""
+        if self.settings.get('cluster', {}).get('enabled', False):
+            return os.path.join(output_dir, '.partial', self.node_name)
+        return os.path.join(output_dir, '.partial')
+    
+    def publish_output(self, partial_path: str, output_filename: str):
+        """Move a finished render into output/ in one step, so readers never see a partial file."""
+        os.replace(partial_path, output_filename)
+    
+    def remove_partial_outputs(self):
+        """Delete renders left in output/.partial/ by a crash; their jobs are requeued and render again."""
+        for profile in self.profiles.profiles:
+            output_dir = profile['settings'].get('file_management', {}).get('output_dir', 'output')
+            partial_dir = self.get_partial_dir(output_dir)
+            if not os.path.isdir(partial_dir):
+                continue
+            for name in os.listdir(partial_dir):
+                if not os.path.isfile(os.path.join(partial_dir, name)):
+                    continue
+                os.remove(os.path.join(partial_dir, name))
+                logger.info(f"Removed partial output from an interrupted run: {os.path.join(partial_dir, name)}")
+    
+    def get_output_cache(self) -> Optional[OutputCache]:
+        """Return the current profile's output cache, or None when it is disabled. Holds up to max_output_files outputs."""
+        performance_settings = self.settings.get('performance_settings', {})
+        if not performance_settings.get('enable_output_cache', True):
+            return None
+        key = (
+            os.path.abspath(performance_settings.get('output_cache_dir', 'cache/outputs')),
+            self.settings.get('file_management', {}).get('max_output_files', 100)
+        )
+        if key not in self.output_caches:
+            self.output_caches[key] = OutputCache(key[0], max_entries=key[1])
+        return self.output_caches[key]
+    
+    def get_output_cache_key(self, video_path: str) -> Optional[str]:
+        """Key of the output this job would produce: input content plus everything that shapes the render."""
+        if self.get_output_cache() is None:
+            return None
+        video_processing = self.settings.get('video_processing', {})
+        logo_config = self.settings.get('logo_configuration', {})
+        logo_files = [
+            logo_config.get('static_logo', {}).get('file', 'assets/static_logo.png'),
+            logo_config.get('animated_logo', {}).get('file', 'assets/video_logo.mp4')
+        ]
+        try:
+            render_inputs = {
+                'segments': [video_processing.get('intro_duration'), video_processing.get('outro_duration')],
+                'logo_configuration': logo_config,
+                'logo_files': [content_hash(path) for path in logo_files],
+                'output_settings': self.settings.get('output_settings', {}),
+                'quality_settings': self.settings.get('quality_settings', {}),
+                'encode_tuning': self.settings.get('encode_tuning', {}),
+                'encode_mode': self.settings.get('performance_settings', {}).get('encode_mode', 'full'),
+                'encoder': self.get_encoder()
+            }
+            return OutputCache.key(content_hash(video_path), settings_hash(render_inputs))
+        except Exception as e:
+            logger.warning(f"Output cache lookup skipped for {video_path}: {e}")
+            return None
+    
+    def serve_cached_output(self, video_path: str, cache_key: str, partial_path: str, output_filename: str) -> bool:
+        """Publish the cached output of an identical earlier job. Returns False on a cache miss."""
+        cached = self.get_output_cache().lookup(cache_key)
+        if cached is None:
+            return False
+        self.check_lease(video_path)
+        try:
+            link_or_copy(cached, partial_path)
+        except OSError as e:
+            logger.warning(f"Could not reuse cached output {cached}: {e}. Rendering instead.")
+            return False
+        # The cached file passed validation when it was stored, so it is published right away
+        self.publish_output(partial_path, output_filename)
+        self.stage('move')
+        processed_path = self.get_unique_processed_path(video_path)
+        self.move_to_processed(video_path, processed_path)
+        self.record_job_value('cache_hit', True)
+        self.record_job_value('bytes_out', os.path.getsize(output_filename))
+        logger.info(f"Served from the output cache: {video_path} -> {output_filename}")
+        return True
+    
+    def store_cached_output(self, cache_key: Optional[str], output_filename: str, video_path: str):
+        """Keep an accepted output for later jobs with the same input and settings."""
+        if cache_key is None or self.get_output_cache() is None:
+            return
+        try:
+            self.get_output_cache().store(cache_key, output_filename, video_path)
+        except Exception as e:
+            logger.warning(f"Could not add {output_filename} to the output cache: {e}")
+    
+    def get_container_args(self) -> List[str]:
+        """Muxer options for final outputs; faststart writes the moov atom at the front as the file is finished."""
+        if self.settings.get('output_settings', {}).get('faststart', True):
+            return ['-movflags', '+faststart']
+        return []
+    
+    def get_job_temp_dir(self, video_path: str) -> str:
+        """Create a private temp directory for one processing attempt (stable per input when checkpointing)."""
+        temp_dir = self.settings.get('video_processing', {}).get('temp_dir', 'temp') or 'temp'
+        if self.checkpointing_enabled():
+            job_temp_dir = os.path.join(temp_dir, checkpoint_dir_name(video_path))
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            job_temp_dir = os.path.join(temp_dir, f"{Path(video_path).stem}_{os.getpid()}_{timestamp}")
+        os.makedirs(job_temp_dir, exist_ok=True)
+        return job_temp_dir
+    
+    def checkpointing_enabled(self) -> bool:
+        """Segment checkpoints apply to segmented encoding, the only mode that writes separate pieces."""
+        performance_settings = self.settings.get('performance_settings', {})
+        return (performance_settings.get('checkpoint_segments', True)
+                and performance_settings.get('encode_mode', 'full') == 'segmented')
+    
+    def remove_stale_checkpoints(self):
+        """Drop checkpoint directories of jobs abandoned long ago."""
+        temp_dir = self.settings.get('video_processing', {}).get('temp_dir', 'temp') or 'temp'
+        max_age_hours = self.settings.get('performance_settings', {}).get('checkpoint_max_age_hours', 24)
+        remove_stale_checkpoints(temp_dir, max_age_hours)
+    
+    def cleanup_temp_files(self, job_temp_dir: str):
+        """Clean up a job's temporary files if enabled."""
         if self.settings.get('performance_settings', {}).get('cleanup_temp_files', True):
-            temp_dir = self.settings.get('video_processing', {}).get('temp_dir', 'temp')
-            if temp_dir and os.path.exists(temp_dir):
+            if job_temp_dir and os.path.exists(job_temp_dir):
                 try:
-                    shutil.rmtree(temp_dir)
-                    os.makedirs(temp_dir, exist_ok=True)
-                    logger.debug("Temporary files cleaned up")
+                    shutil.rmtree(job_temp_dir)
+                    logger.debug(f"Temporary files cleaned up: {job_temp_dir}")
                 except Exception as e:
                     logger.warning(f"Failed to cleanup temp files: {e}")
     
+    def get_logo_assets(self) -> dict:
+        """Return the logo files to composite, pre-rendered through the asset cache when enabled."""
+        logo_config = self.settings.get('logo_configuration', {})
+        static_config = logo_config.get('static_logo', {})
+        animated_config = logo_config.get('animated_logo', {})
+        performance_settings = self.settings.get('performance_settings', {})
+        
+        if performance_settings.get('enable_asset_cache', True):
+            try:
+                cache_dir = os.path.abspath(performance_settings.get('asset_cache_dir', 'cache/assets'))
+                if cache_dir not in self.asset_caches:
+                    self.asset_caches[cache_dir] = LogoAssetCache(cache_dir)
+                asset_cache = self.asset_caches[cache_dir]
+                return {
+                    'static_file': asset_cache.get_static_logo(static_config),
+                    'animated_file': asset_cache.get_animated_logo(animated_config),
+                    'prepared': True
+                }
+            except Exception as e:
+                logger.warning(f"Logo asset cache unavailable, preparing logos per job: {e}")
+        
+        return {
+            'static_file': static_config.get('file', 'assets/static_logo.png'),
+            'animated_file': animated_config.get('file', 'assets/video_logo.mp4'),
+            'prepared': False
+        }
+    
+    def build_ffmpeg_params(self, video_info: dict, video_path: Optional[str] = None) -> dict:
+        """Build write_videofile parameters from output and quality settings."""
+        output_settings = self.settings.get('output_settings', {})
+        quality_settings = self.settings.get('quality_settings', {})
+        
+        ffmpeg_params = {
+            'codec': self.get_encoder(),
+            'audio_codec': output_settings.get('audio_codec', 'aac'),
+            'fps': output_settings.get('fps') or video_info['fps']
+        }
+        
+        preset = output_settings.get('preset')
+        crf = output_settings.get('crf')
+        tuned = self.get_encode_tuning(video_path, video_info, ffmpeg_params['codec']) if video_path else None
+        if tuned:
+            preset, crf = tuned['preset'], tuned['crf']
+        
+        # Add quality settings using ffmpeg_params for advanced options
+        ffmpeg_extra_args = encoder_probe.quality_args(ffmpeg_params['codec'], preset, crf)
+        
+        if output_settings.get('bitrate'):
+            ffmpeg_extra_args.extend(['-b:v', output_settings['bitrate']])
+        if output_settings.get('audio_bitrate'):
+            ffmpeg_extra_args.extend(['-b:a', output_settings['audio_bitrate']])
+        if quality_settings.get('threads'):
+            ffmpeg_extra_args.extend(['-threads', str(quality_settings['threads'])])
+        if quality_settings.get('buffer_size'):
+            ffmpeg_extra_args.extend(['-bufsize', quality_settings['buffer_size']])
+        
+        # Add extra FFmpeg arguments if any
+        if ffmpeg_extra_args:
+            ffmpeg_params['ffmpeg_params'] = ffmpeg_extra_args
+        return ffmpeg_params
+    
+    def plan_middle_chunks(self, video_path: str, middle_start: float, middle_end: float) -> List[float]:
+        """Return chunk boundaries for the middle section, or just its endpoints when chunking is off."""
+        performance_settings = self.settings.get('performance_settings', {})
+        chunk_seconds = performance_settings.get('chunk_size_seconds', 30)
+        if not performance_settings.get('parallel_chunk_encoding', False) or not chunk_seconds:
+            return [middle_start, middle_end]
+        keyframes = keyframe_times(video_path, middle_start, middle_end)
+        return ffmpeg_tools.plan_chunk_boundaries(middle_start, middle_end, chunk_seconds, keyframes)
+    
+    def get_chunk_workers(self, chunk_count: int) -> int:
+        """Number of chunks encoded at once, shared fairly with the other worker processes."""
+        configured = self.settings.get('performance_settings', {}).get('chunk_workers', 0)
+        if not configured:
+            configured = max(1, (os.cpu_count() or 1) // resolve_pool_size(self.settings))
+        return max(1, min(configured, chunk_count))
+    
+    def get_encode_tuning(self, video_path: str, video_info: dict, codec: str) -> Optional[dict]:
+        """Pick preset/crf with trial encodes when encode tuning is enabled (x264/x265 only)."""
+        tuning_settings = self.settings.get('encode_tuning', {})
+        if not tuning_settings.get('enabled', False) or not codec.startswith('libx26'):
+            return None
+        temp_dir = self.settings.get('video_processing', {}).get('temp_dir', 'temp') or 'temp'
+        try:
+            return EncodeTuner(tuning_settings, temp_dir).tune(video_path, video_info, codec)
+        except Exception as e:
+            logger.warning(f"Encode tuning failed for {video_path}: {e}. Using configured preset/crf.")
+            return None
+    
+    def get_encoder(self) -> str:
+        """Return the fastest encoder that passed a trial encode, probing once per machine."""
+        output_settings = self.settings.get('output_settings', {})
+        quality_settings = self.settings.get('quality_settings', {})
+        # Profiles may ask for different codecs, so remember one choice per request
+        request = (
+            output_settings.get('video_codec', 'libx264'),
+            quality_settings.get('enable_hardware_acceleration', False),
+            quality_settings.get('gpu_codec')
+        )
+        ttl_seconds = self.get_encoder_probe_ttl()
+        # A new generation means the probe results expired or the devices changed, so choose again
+        generation = encoder_probe.refresh(self.get_encoder_cache_path(), ttl_seconds)
+        if self.encoders.get(request, (None, None))[0] != generation:
+            codec = encoder_probe.select_encoder(
+                request[0], use_hardware=request[1], gpu_codec=request[2], cache_path=self.get_encoder_cache_path(),
+                ttl_seconds=ttl_seconds
+            )
+            self.encoders[request] = (generation, codec)
+            logger.info(f"Using video encoder: {codec}")
+        return self.encoders[request][1]
+    
+    def get_encoder_cache_path(self) -> str:
+        return self.settings.get('performance_settings', {}).get('encoder_cache_path', 'cache/encoders.json')
+    
+    def get_encoder_probe_ttl(self) -> Optional[float]:
+        hours = self.settings.get('performance_settings', {}).get('encoder_probe_ttl_hours', 24)
+        return hours * 3600 if hours else None
+    
+    def _write_segmented(self, video_path: str, intro_with_logos, outro_with_logos, middle_start: float,
+                         middle_end: float, output_filename: str, ffmpeg_params: dict, job_temp_dir: str,
+                         logo_assets: dict):
+        """Encode intro/outro with MoviePy, the middle with one FFmpeg overlay pass, then concat without re-encoding."""
+        checkpoints = None
+        if self.checkpointing_enabled():
+            checkpoints = SegmentCheckpoints(job_temp_dir, segment_fingerprint(video_path, {
+                'ffmpeg_params': ffmpeg_params,
+                'logo_assets': {key: (value, os.path.getmtime(value)) if isinstance(value, str) else value
+                                for key, value in logo_assets.items()},
+                'logo_configuration': self.settings.get('logo_configuration', {}),
+                'video_processing': self.settings.get('video_processing', {}),
+                'performance_settings': self.settings.get('performance_settings', {})
+            }))
+        
+        def piece(name: str, duration: float, build) -> str:
+            if checkpoints is not None:
+                path = checkpoints.run(name, duration, build)
+            else:
+                path = os.path.join(job_temp_dir, name)
+                build(path)
+            if self.progress is not None:
+                # Also counts pieces reused from a checkpoint, which report no frames
+                self.progress.complete(os.path.splitext(name)[0], round(duration * ffmpeg_params['fps']))
+            return path
+        
+        # Force yuv420p on the MoviePy pieces too so all three segments share one stream layout
+        segment_params = dict(ffmpeg_params)
+        segment_params['ffmpeg_params'] = list(ffmpeg_params.get('ffmpeg_params', [])) + ['-pix_fmt', 'yuv420p']
+        
+        intro_path = piece("intro.mp4", intro_with_logos.duration, lambda path: intro_with_logos.write_videofile(
+            path, temp_audiofile_path=job_temp_dir, logger=self.moviepy_logger('intro'), **segment_params
+        ))
+        
+        static_config = self.settings.get('logo_configuration', {}).get('static_logo', {})
+        boundaries = self.plan_middle_chunks(video_path, middle_start, middle_end)
+        
+        # The middle needs an audio track exactly when the MoviePy pieces have one (the input's or the animated logo's)
+        include_audio = intro_with_logos.audio is not None
+        
+        def build_middle(middle_path: str):
+            self._write_middle(video_path, boundaries, middle_path, static_config, ffmpeg_params,
+                               job_temp_dir, logo_assets, checkpoints, include_audio)
+        
+        middle_path = piece("middle.mp4", middle_end - middle_start, build_middle)
+        outro_path = piece("outro.mp4", outro_with_logos.duration, lambda path: outro_with_logos.write_videofile(
+            path, temp_audiofile_path=job_temp_dir, logger=self.moviepy_logger('outro'), **segment_params
+        ))
+        
+        ffmpeg_tools.concat_segments([intro_path, middle_path, outro_path], output_filename, job_temp_dir,
+                                     extra_args=self.get_container_args())
+    
+    def _write_middle(self, video_path: str, boundaries: List[float], middle_path: str, static_config: dict,
+                      ffmpeg_params: dict, job_temp_dir: str, logo_assets: dict, checkpoints, include_audio: bool):
+        """Render the static-logo middle section, in parallel chunks when more than one is planned."""
+        middle_start, middle_end = boundaries[0], boundaries[-1]
+        source_has_audio = self.get_video_info(video_path)['audio']
+        if len(boundaries) > 2:
+            workers = self.get_chunk_workers(len(boundaries) - 1)
+            extra_args = list(ffmpeg_params.get('ffmpeg_params', []))
+            if '-threads' not in extra_args:
+                # Split the cores between concurrent chunk encoders instead of oversubscribing them
+                extra_args += ['-threads', str(max(1, (os.cpu_count() or 1) // workers))]
+            logger.info(f"Encoding middle section as {len(boundaries) - 1} chunks on {workers} encoder(s)")
+            ffmpeg_tools.render_static_overlay_chunked(
+                video_path,
+                boundaries,
+                logo_assets['static_file'],
+                static_config,
+                middle_path,
+                codec=ffmpeg_params['codec'],
+                audio_codec=ffmpeg_params['audio_codec'],
+                fps=ffmpeg_params['fps'],
+                work_dir=job_temp_dir,
+                max_workers=workers,
+                extra_args=extra_args,
+                prepared=logo_assets['prepared'],
+                checkpoints=checkpoints,
+                progress=(lambda index, frames: self.progress.update(f"middle/{index}", frames))
+                if self.progress is not None else None,
+                include_audio=include_audio,
+                source_has_audio=source_has_audio
+            )
+        else:
+            ffmpeg_tools.render_static_overlay(
+                video_path,
+                middle_start,
+                middle_end,
+                logo_assets['static_file'],
+                static_config,
+                middle_path,
+                codec=ffmpeg_params['codec'],
+                audio_codec=ffmpeg_params['audio_codec'],
+                fps=ffmpeg_params['fps'],
+                extra_args=ffmpeg_params.get('ffmpeg_params'),
+                prepared=logo_assets['prepared'],
+                include_audio=include_audio,
+                progress=self.frame_progress('middle'),
+                source_has_audio=source_has_audio
+            )
+    
     def _process_video_once(self, video_path: str) -> bool:
         """Run a single processing attempt. Returns False for non-retryable skips."""
         logger.info(f"Starting processing of: {video_path}")
         
         # Get video info
+        self.stage('probe')
         video_info = self.get_video_info(video_path)
+        self.record_job_value('bytes_in', os.path.getsize(video_path))
         logger.info(f"Video info: duration={video_info['duration']:.2f}s, size={video_info['size']}, fps={video_info['fps']}")
         
         # Check if video is long enough for the segments
@@ -182,6 +628,197 @@ class VideoProcessor:
             logger.warning(f"Video too short ({video_info['duration']:.2f}s) for minimum duration ({min_duration}s). Skipping.")
             return False
         
+        # Generate output filename
+        self.stage('prepare')
+        output_filename = self.get_output_filename(video_path)
+        partial_path = self.get_partial_path(output_filename)
+        
+        # An identical input rendered with identical settings is served from the output cache
+        self.stage('cache')
+        cache_key = self.get_output_cache_key(video_path)
+        if cache_key is not None and self.serve_cached_output(video_path, cache_key, partial_path, output_filename):
+            return True
+        
+        # Build FFmpeg parameters
+        self.stage('tune')
+        ffmpeg_params = self.build_ffmpeg_params(video_info, video_path)
+        
+        job_temp_dir = self.get_job_temp_dir(video_path)
+        completed = False
+        try:
+            logger.info(f"Exporting to: {output_filename}")
+            with self.track_progress(video_path, int(video_info['duration'] * ffmpeg_params['fps'])):
+                try:
+                    self.render_video(video_path, video_info, partial_path, ffmpeg_params, job_temp_dir)
+                except Exception as e:
+                    if encoder_probe.is_software_encoder(ffmpeg_params['codec']):
+                        raise
+                    # A hardware encoder that passed its probe can still fail (driver reset, session limit);
+                    # switch this and later jobs to software right away instead of spending retries on it
+                    logger.warning(f"Encoder {ffmpeg_params['codec']} failed: {e}. Re-encoding with a software encoder.")
+                    encoder_probe.mark_failed(ffmpeg_params['codec'], self.get_encoder_cache_path())
+                    self.encoders.clear()
+                    ffmpeg_params = self.build_ffmpeg_params(video_info, video_path)
+                    self.render_video(video_path, video_info, partial_path, ffmpeg_params, job_temp_dir)
+            
+            # Validate output if enabled
+            self.stage('validate')
+            if self.settings.get('advanced_settings', {}).get('validate_output', True):
+                if os.path.exists(partial_path) and os.path.getsize(partial_path) > 0:
+                    logger.info("Output validation successful")
+                else:
+                    raise Exception("Output validation failed - file is empty or missing")
+            
+            self.record_job_value('bytes_out', os.path.getsize(partial_path))
+            self.record_job_value('frames', int(video_info['duration'] * ffmpeg_params['fps']))
+            
+            if self.deep_validation_enabled():
+                # The dispatcher checks the output in the background and moves the input once it passes
+                self.last_output = {
+                    'path': partial_path,
+                    'final_path': output_filename,
+                    'checks': self.get_output_checks(video_info, ffmpeg_params),
+                    'cache_key': cache_key
+                }
+                logger.info(f"Rendered {video_path} -> {output_filename}; deep validation runs in the background")
+                completed = True
+                return True
+            
+            self.check_lease(video_path)
+            self.publish_output(partial_path, output_filename)
+            self.store_cached_output(cache_key, output_filename, video_path)
+            
+            # Move processed file (collision-safe)
+            self.stage('move')
+            processed_path = self.get_unique_processed_path(video_path)
+            self.move_to_processed(video_path, processed_path)
+            
+            logger.info(f"Successfully processed: {video_path} -> {output_filename}")
+            completed = True
+            return True
+        finally:
+            self.stage('cleanup')
+            # Keep checkpointed pieces of a failed attempt so the retry can resume from them
+            if completed or not self.checkpointing_enabled():
+                self.cleanup_temp_files(job_temp_dir)
+            if not completed and os.path.exists(partial_path):
+                os.remove(partial_path)
+    
+    @contextmanager
+    def track_progress(self, video_path: str, total_frames: int):
+        """Publish the encode progress of the block to the log and the job store."""
+        performance_settings = self.settings.get('performance_settings', {})
+        if not performance_settings.get('progress_reporting', True):
+            yield
+            return
+        self.progress = ProgressTracker(
+            os.path.basename(video_path),
+            total_frames,
+            on_update=lambda progress: self.get_job_store().set_progress(video_path, progress),
+            interval_seconds=performance_settings.get('progress_interval_seconds', 2),
+            log_interval_seconds=performance_settings.get('progress_log_interval_seconds', 15),
+            stall_seconds=performance_settings.get('progress_stall_seconds', 120)
+        )
+        self.progress.start()
+        try:
+            yield
+        finally:
+            self.progress.stop()
+            self.progress = None
+    
+    def frame_progress(self, part: str) -> Optional[Callable[[int], None]]:
+        """Frame count callback for one FFmpeg encoder of the current job, or None without progress reporting."""
+        return self.progress.part(part) if self.progress is not None else None
+    
+    def moviepy_logger(self, part: str):
+        """write_videofile logger: reports frames to the job's progress; draws the console bar if enable_progress_bar."""
+        console = self.settings.get('performance_settings', {}).get('enable_progress_bar', True)
+        if self.progress is None:
+            return 'bar' if console else None
+        return FrameProgressLogger(self.progress.part(part), console=console)
+    
+    def deep_validation_enabled(self) -> bool:
+        advanced_settings = self.settings.get('advanced_settings', {})
+        return advanced_settings.get('validate_output', True) and advanced_settings.get('deep_validation', True)
+    
+    def get_output_checks(self, video_info: dict, ffmpeg_params: dict) -> dict:
+        """Describe what a correct output of this input looks like, for validate_output."""
+        video_processing = self.settings.get('video_processing', {})
+        advanced_settings = self.settings.get('advanced_settings', {})
+        duration = video_info['duration']
+        checks = {
+            'expected_duration': duration,
+            'expect_audio': video_info['audio'],
+            'expected_frames': int(round(duration * ffmpeg_params['fps'])),
+            'duration_tolerance': advanced_settings.get('validation_duration_tolerance', 0.5)
+        }
+        if advanced_settings.get('validation_decode_samples', True):
+            # Decode across the intro and outro joins, where segmented encodes are spliced together
+            checks['sample_times'] = [video_processing['intro_duration'], duration - video_processing['outro_duration']]
+        return checks
+    
+    def render_video(self, video_path: str, video_info: dict, output_filename: str, ffmpeg_params: dict, job_temp_dir: str):
+        """Render the branded video with the configured backend, falling back to MoviePy."""
+        backend = self.settings.get('output_settings', {}).get('render_backend', 'moviepy')
+        if backend == 'ffmpeg':
+            try:
+                self._render_with_ffmpeg(video_path, video_info, output_filename, ffmpeg_params)
+                return
+            except Exception as e:
+                logger.warning(f"FFmpeg render backend failed for {video_path}: {e}. Falling back to MoviePy.")
+        elif backend != 'moviepy':
+            logger.warning(f"Unknown render backend '{backend}', using MoviePy")
+        self._render_with_moviepy(video_path, video_info, output_filename, ffmpeg_params, job_temp_dir)
+    
+    def get_animated_logo_position(self, video_info: dict):
+        """Return the MoviePy-style position of the animated logo for a video."""
+        animated_config = self.settings.get('logo_configuration', {}).get('animated_logo', {})
+        if animated_config.get('position') == 'center':
+            bottom_margin = animated_config.get('bottom_margin', 120)
+            return ("center", video_info['size'][1] - bottom_margin)
+        return animated_config.get('position', ("center", "bottom"))
+    
+    def _render_with_ffmpeg(self, video_path: str, video_info: dict, output_filename: str, ffmpeg_params: dict):
+        """Compile the branding plan into one FFmpeg filter_complex invocation."""
+        video_processing = self.settings.get('video_processing', {})
+        logo_config = self.settings.get('logo_configuration', {})
+        static_config = logo_config.get('static_logo', {})
+        animated_config = logo_config.get('animated_logo', {})
+        self.stage('assets')
+        logo_assets = self.get_logo_assets()
+        
+        plan = {
+            'video_path': video_path,
+            'duration': video_info['duration'],
+            'has_audio': video_info['audio'],
+            'intro_duration': video_processing["intro_duration"],
+            'outro_start': video_info['duration'] - video_processing["outro_duration"],
+            'outro_duration': video_processing["outro_duration"],
+            'static_logo_file': logo_assets['static_file'],
+            'static_config': static_config,
+            'animated_logo_file': logo_assets['animated_file'],
+            'animated_config': animated_config,
+            'animated_has_audio': self.get_video_info(logo_assets['animated_file'])['audio'],
+            'logos_prepared': logo_assets['prepared'],
+            'animated_position': self.get_animated_logo_position(video_info)
+        }
+        self.stage('encode')
+        if self.progress is not None:
+            self.progress.reset()
+        ffmpeg_tools.render_branding_plan(
+            plan,
+            output_filename,
+            codec=ffmpeg_params['codec'],
+            audio_codec=ffmpeg_params['audio_codec'],
+            fps=ffmpeg_params['fps'],
+            extra_args=list(ffmpeg_params.get('ffmpeg_params', [])) + self.get_container_args(),
+            progress=self.frame_progress('video')
+        )
+    
+    def _render_with_moviepy(self, video_path: str, video_info: dict, output_filename: str, ffmpeg_params: dict, job_temp_dir: str):
+        """Composite the logos frame by frame with MoviePy and export the result."""
+        video_processing = self.settings.get('video_processing', {})
+        
         # Prepare assets and clips
         main_video = None
         static_logo = None
@@ -195,6 +832,7 @@ class VideoProcessor:
         final = None
         try:
             # Load main video
+            self.stage('assets')
             main_video = VideoFileClip(video_path)
             
             # Prepare logos with enhanced settings
@@ -202,50 +840,49 @@ class VideoProcessor:
             static_config = logo_config.get('static_logo', {})
             animated_config = logo_config.get('animated_logo', {})
             
-            # Create static logo with width/height support
-            static_file = self.settings.get('logo_configuration', {}).get('static_logo', {}).get('file', 'assets/static_logo.png')
-            static_logo = ImageClip(static_file)
+            logo_assets = self.get_logo_assets()
             
-            # Apply width and height resizing
-            static_width = static_config.get('width')
-            static_height = static_config.get('height', 80)
+            # Create static logo with width/height support
+            static_logo = ImageClip(logo_assets['static_file'])
             
-            if static_width and static_height:
-                static_logo = static_logo.resized(width=static_width, height=static_height)
-            elif static_width:
-                static_logo = static_logo.resized(width=static_width)
-            else:
-                static_logo = static_logo.resized(height=static_height)
+            if not logo_assets['prepared']:
+                # Apply width and height resizing, unless the logo was already prepared at that size
+                static_size = logo_target_size(static_config, static_logo.size, 80)
+                if tuple(static_logo.size) != static_size:
+                    static_logo = static_logo.resized(new_size=static_size)
+                
+                if static_config.get('opacity', 1.0) != 1.0:
+                    static_logo = static_logo.with_opacity(static_config.get('opacity', 1.0))
             
             static_logo = static_logo.with_position(static_config.get('position', [20, 20]))
             
-            if static_config.get('opacity', 1.0) != 1.0:
-                static_logo = static_logo.with_opacity(static_config.get('opacity', 1.0))
-            
             # Create animated logo with width/height support
-            animated_file = self.settings.get('logo_configuration', {}).get('animated_logo', {}).get('file', 'assets/video_logo.mp4')
-            animated_logo = VideoFileClip(animated_file)
-            
-            # Apply width and height resizing
-            animated_width = animated_config.get('width')
-            animated_height = animated_config.get('height', 100)
-            
-            if animated_width and animated_height:
-                animated_logo = animated_logo.resized(width=animated_width, height=animated_height)
-            elif animated_width:
-                animated_logo = animated_logo.resized(width=animated_width)
+            if logo_assets['prepared']:
+                # Cached layer is already sized; read its alpha only when opacity was baked in
+                animated_logo = VideoFileClip(
+                    logo_assets['animated_file'],
+                    has_mask=animated_config.get('opacity', 1.0) != 1.0
+                )
             else:
-                animated_logo = animated_logo.resized(height=animated_height)
+                animated_logo = VideoFileClip(logo_assets['animated_file'])
+                
+                # Apply width and height resizing
+                animated_width = animated_config.get('width')
+                animated_height = animated_config.get('height', 100)
+                
+                if animated_width and animated_height:
+                    animated_logo = animated_logo.resized(width=animated_width, height=animated_height)
+                elif animated_width:
+                    animated_logo = animated_logo.resized(width=animated_width)
+                else:
+                    animated_logo = animated_logo.resized(height=animated_height)
+                
+                if animated_config.get('opacity', 1.0) != 1.0:
+                    animated_logo = animated_logo.with_opacity(animated_config.get('opacity', 1.0))
             
             # Position animated logo
-            if animated_config.get('position') == 'center':
-                bottom_margin = animated_config.get('bottom_margin', 120)
-                animated_logo = animated_logo.with_position(("center", video_info['size'][1] - bottom_margin))
-            else:
-                animated_logo = animated_logo.with_position(animated_config.get('position', ("center", "bottom")))
-            
-            if animated_config.get('opacity', 1.0) != 1.0:
-                animated_logo = animated_logo.with_opacity(animated_config.get('opacity', 1.0))
+            self.stage('compose')
+            animated_logo = animated_logo.with_position(self.get_animated_logo_position(video_info))
             
             # Split into segments
             intro_duration = video_processing["intro_duration"]
@@ -266,81 +903,40 @@ class VideoProcessor:
                 animated_logo.with_duration(intro_duration)
             ])
             
-            middle_with_logo = CompositeVideoClip([
-                middle_clip,
-                static_logo.with_duration(middle_clip.duration)
-            ])
-            
             outro_with_logos = CompositeVideoClip([
                 outro_clip,
                 static_logo.with_duration(outro_duration),
                 animated_logo.with_duration(outro_duration)
             ])
             
-            # Concatenate segments
-            final = concatenate_videoclips([intro_with_logos, middle_with_logo, outro_with_logos])
-            
-            # Generate output filename
-            output_filename = self.get_output_filename(video_path)
-            
-            # Prepare output settings
-            output_settings = self.settings.get('output_settings', {})
-            quality_settings = self.settings.get('quality_settings', {})
-            
-            # Build FFmpeg parameters
-            ffmpeg_params = {
-                'codec': output_settings.get('video_codec', 'libx264'),
-                'audio_codec': output_settings.get('audio_codec', 'aac'),
-                'fps': output_settings.get('fps') or video_info['fps']
-            }
-            
-            # Add quality settings using ffmpeg_params for advanced options
-            ffmpeg_extra_args = []
-            
-            if output_settings.get('preset'):
-                ffmpeg_extra_args.extend(['-preset', output_settings['preset']])
-            if output_settings.get('crf'):
-                ffmpeg_extra_args.extend(['-crf', str(output_settings['crf'])])
-            if output_settings.get('bitrate'):
-                ffmpeg_extra_args.extend(['-b:v', output_settings['bitrate']])
-            if output_settings.get('audio_bitrate'):
-                ffmpeg_extra_args.extend(['-b:a', output_settings['audio_bitrate']])
-            if quality_settings.get('threads'):
-                ffmpeg_extra_args.extend(['-threads', str(quality_settings['threads'])])
-            if quality_settings.get('buffer_size'):
-                ffmpeg_extra_args.extend(['-bufsize', quality_settings['buffer_size']])
-            
-            # Hardware acceleration
-            if quality_settings.get('enable_hardware_acceleration', False):
-                ffmpeg_params['codec'] = quality_settings.get('gpu_codec', 'h264_nvenc')
-            
-            # Add extra FFmpeg arguments if any
-            if ffmpeg_extra_args:
-                ffmpeg_params['ffmpeg_params'] = ffmpeg_extra_args
+            # Segmented mode renders the middle with FFmpeg, so it never goes through MoviePy
+            encode_mode = self.settings.get('performance_settings', {}).get('encode_mode', 'full')
+            if encode_mode != 'segmented':
+                middle_with_logo = CompositeVideoClip([
+                    middle_clip,
+                    static_logo.with_duration(middle_clip.duration)
+                ])
+                
+                # Concatenate segments
+                final = concatenate_videoclips([intro_with_logos, middle_with_logo, outro_with_logos])
             
             # Export final video
-            logger.info(f"Exporting to: {output_filename}")
-            final.write_videofile(
-                output_filename,
-                **ffmpeg_params
-            )
-            
-            # Validate output if enabled
-            if self.settings.get('advanced_settings', {}).get('validate_output', True):
-                if os.path.exists(output_filename) and os.path.getsize(output_filename) > 0:
-                    logger.info("Output validation successful")
-                else:
-                    raise Exception("Output validation failed - file is empty or missing")
-            
-            # Move processed file (collision-safe)
-            processed_path = self.get_unique_processed_path(video_path)
-            os.rename(video_path, processed_path)
-            
-            # Cleanup temp files
-            self.cleanup_temp_files()
-            
-            logger.info(f"Successfully processed: {video_path} -> {output_filename}")
-            return True
+            self.stage('encode')
+            if self.progress is not None:
+                # Start from zero, also after the FFmpeg backend gave up part way
+                self.progress.reset()
+            if encode_mode == 'segmented':
+                self._write_segmented(
+                    video_path, intro_with_logos, outro_with_logos, middle_start, middle_end,
+                    output_filename, ffmpeg_params, job_temp_dir, logo_assets
+                )
+            else:
+                final.write_videofile(
+                    output_filename,
+                    temp_audiofile_path=job_temp_dir,
+                    logger=self.moviepy_logger('video'),
+                    **{**ffmpeg_params, 'ffmpeg_params': list(ffmpeg_params.get('ffmpeg_params', [])) + self.get_container_args()}
+                )
         finally:
             # Cleanup resources safely
             for clip in [intro_with_logos, middle_with_logo, outro_with_logos, intro_clip, middle_clip, outro_clip, final, static_logo, animated_logo, main_video]:
@@ -350,58 +946,558 @@ class VideoProcessor:
                 except Exception:
                     pass
 
-    def process_video(self, video_path: str) -> bool:
-        """Process a single video file with retries and memory throttling."""
+
+    def process_video(self, video_path: str, overrides: Optional[dict] = None, max_attempts: Optional[int] = None) -> bool:
+        """Process a single video file with retries.
+        
+        max_attempts overrides the configured retry budget, e.g. 1 when the caller retries through the job store.
+        Memory admission happens before this is called: the dispatcher admits each job against the memory budget.
+        """
+        with self.processing_lock, self.use_profile(video_path, overrides):
+            if max_attempts is None:
+                max_attempts = self.get_max_attempts()
+            self.job_metrics = JobMetrics()
+            self.last_output = None
+            outcome = 'failed'
+            try:
+                for attempt in range(1, max_attempts + 1):
+                    self.job_metrics.set('attempts', attempt)
+                    try:
+                        result = self._process_video_once(video_path)
+                        # If result is False, it was a non-retryable condition (e.g., too short)
+                        outcome = 'success' if result is not False else 'skipped'
+                        return result is not False
+                    except LeaseLost as e:
+                        # Another node owns the video now; retrying here would only race it
+                        logger.error(str(e))
+                        outcome = 'lease_lost'
+                        return False
+                    except Exception as e:
+                        logger.error(f"Attempt {attempt}/{max_attempts} failed for {video_path}: {e}")
+                        if attempt < max_attempts:
+                            backoff_seconds = 2 ** (attempt - 1)
+                            logger.info(f"Retrying in {backoff_seconds}s...")
+                            self.stage('retry_backoff')
+                            time.sleep(backoff_seconds)
+                        else:
+                            logger.error(f"All retry attempts exhausted for {video_path}")
+                            return False
+            finally:
+                self.last_job_metrics = self.job_metrics.finish(outcome)
+                self.job_metrics = None
+    
+    def get_max_attempts(self) -> int:
         retry_settings = self.settings.get('advanced_settings', {})
-        enable_retry = retry_settings.get('retry_failed_processing', True)
-        max_attempts = max(1, retry_settings.get('max_retry_attempts', 3)) if enable_retry else 1
-        for attempt in range(1, max_attempts + 1):
-            self.check_memory_usage()
+        if not retry_settings.get('retry_failed_processing', True):
+            return 1
+        return max(1, retry_settings.get('max_retry_attempts', 3))
+    
+    def stage(self, name: str):
+        """Start timing the next stage of the current job."""
+        if self.job_metrics is not None:
+            self.job_metrics.stage(name)
+    
+    def record_job_value(self, key: str, value):
+        """Attach a value such as byte or frame counts to the current job's metrics."""
+        if self.job_metrics is not None:
+            self.job_metrics.set(key, value)
+    
+    def submit_video(self, video_path: str, overrides: Optional[dict] = None, max_attempts: Optional[int] = None) -> Future:
+        """Schedule a video for processing, on the worker pool when parallel processing is enabled.
+        
+        The future resolves to a report with the job result and, with deep validation on,
+        the output that still has to be checked.
+        """
+        pool_size = resolve_pool_size(self.settings)
+        if pool_size > 1:
+            with self.pool_lock:
+                if self.worker_pool is None:
+                    self.worker_pool = WorkerPool(
+                        pool_size,
+                        functools.partial(VideoProcessor, lease_node=self.worker_id if self.leases is not None else None),
+                        on_report=lambda report: self.metrics.record_job(report.get('metrics'))
+                    )
+            return self.worker_pool.submit(video_path, overrides, max_attempts)
+        
+        # Single worker: run inline on the calling dispatcher thread
+        future: Future = Future()
+        result = self.process_video(video_path, overrides, max_attempts)
+        self.metrics.record_job(self.last_job_metrics)
+        future.set_result({'result': result, 'output': self.last_output, 'metrics': self.last_job_metrics})
+        return future
+    
+    def start_metrics_server(self):
+        """Serve /metrics when enabled in the settings."""
+        metrics_settings = self.settings.get('metrics', {})
+        if not metrics_settings.get('enabled', False):
+            return
+        self.metrics.add_collector(self.collect_queue_metrics)
+        self.metrics_server = MetricsServer(
+            self.metrics,
+            host=metrics_settings.get('host', '127.0.0.1'),
+            port=metrics_settings.get('port', 9108)
+        )
+        self.metrics_server.start()
+    
+    def start_api(self):
+        """Serve the job submission API when enabled in the settings."""
+        api_settings = self.settings.get('api', {})
+        if not api_settings.get('enabled', False):
+            return
+        self.api_server = JobApiServer(
+            self,
+            host=api_settings.get('host', '127.0.0.1'),
+            port=api_settings.get('port', 9109),
+            token=api_settings.get('token'),
+            max_upload_mb=api_settings.get('max_upload_mb', 4096),
+            event_poll_seconds=api_settings.get('event_poll_seconds', 0.5)
+        )
+        self.api_server.start()
+    
+    def collect_queue_metrics(self, registry: MetricsRegistry):
+        """Refresh dispatch queue and job store gauges before a scrape."""
+        if self.dispatcher is not None:
+            stats = self.dispatcher.stats()
+            registry.set_gauge('video_dispatch_queue_depth', stats['depth'])
+            registry.set_gauge('video_dispatch_queue_capacity', stats['capacity'])
+            registry.set_gauge('video_dispatch_rejected_total', stats['rejected'])
+            registry.set_gauge('video_dispatch_blocked_seconds_total', stats['blocked_seconds'])
+        if self.admission is not None:
+            stats = self.admission.stats()
+            registry.set_gauge('video_memory_reserved_bytes', stats['reserved_mb'] * 1024 * 1024)
+            registry.set_gauge('video_admission_waiting_jobs', stats['waiting'])
+        if self.job_store is not None:
+            for state, count in self.job_store.counts().items():
+                registry.set_gauge('video_job_store_jobs', count, state=state)
+    
+    def shutdown(self):
+        """Wait for running jobs, then stop the dispatcher and the worker pool."""
+        if self.api_server is not None:
+            self.api_server.stop()
+            self.api_server = None
+        if self.rescan_thread is not None:
+            self.rescan_stop.set()
+            self.rescan_thread.join()
+            self.rescan_thread = None
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+            self.dispatcher.log_stats()
+            self.dispatcher = None
+        if self.validation_executor is not None:
+            self.validation_executor.shutdown(wait=True)
+            self.validation_executor = None
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+            self.worker_pool = None
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.leases is not None:
+            self.leases.stop()
+            self.leases = None
+    
+    def start_cluster(self):
+        """Join the cluster when enabled: leases on the shared input folder decide which node runs each video."""
+        cluster_settings = self.settings.get('cluster', {})
+        if not cluster_settings.get('enabled', False):
+            return
+        self.leases = LeaseManager(
+            cluster_settings.get('lease_dir', 'input/.leases'),
+            self.worker_id,
+            ttl_seconds=cluster_settings.get('lease_ttl_seconds', 120),
+            heartbeat_seconds=cluster_settings.get('heartbeat_seconds', 20)
+        )
+        self.leases.start()
+        self.rescan_thread = threading.Thread(
+            target=self._rescan_loop, args=(cluster_settings.get('rescan_seconds', 30),), name="cluster-rescan", daemon=True
+        )
+        self.rescan_thread.start()
+    
+    def _rescan_loop(self, interval: float):
+        """Rescan the shared input periodically; picks up files whose owner node died and whose lease expired."""
+        while not self.rescan_stop.wait(interval):
             try:
-                with self.processing_lock:
-                    result = self._process_video_once(video_path)
-                # If result is False, it was a non-retryable condition (e.g., too short)
-                if result is False:
-                    return False
-                return True
+                if self.scan_input_backlog()[1]:
+                    self.wake_dispatcher()
             except Exception as e:
-                logger.error(f"Attempt {attempt}/{max_attempts} failed for {video_path}: {e}")
-                if attempt < max_attempts:
-                    backoff_seconds = 2 ** (attempt - 1)
-                    logger.info(f"Retrying in {backoff_seconds}s...")
-                    time.sleep(backoff_seconds)
+                logger.warning(f"Cluster rescan failed: {e}")
+    
+    def acquire_lease(self, job: dict) -> bool:
+        """In cluster mode, take the video's lease before running it. Returns False if the job should be dropped."""
+        if self.leases is None:
+            return True
+        if not self.leases.acquire(job['path']):
+            logger.info(f"Job {job['id']}: {job['path']} is being processed by {self.leases.owner(job['path'])}")
+            self.get_job_store().forget(job['id'])
+            return False
+        if not os.path.exists(job['path']):
+            # Another node finished it after this node queued it
+            self.leases.release(job['path'])
+            self.get_job_store().forget(job['id'])
+            return False
+        return True
+    
+    def release_lease(self, video_path: str):
+        if self.leases is not None:
+            self.leases.release(video_path)
+    
+    def check_lease(self, video_path: str):
+        """In cluster mode, raise LeaseLost unless this node still owns video_path; called right before publishing."""
+        if self.leases is not None:
+            held = self.leases.holds(video_path)
+        elif self.lease_node is not None:
+            if self.lease_view is None:
+                cluster_settings = self.settings.get('cluster', {})
+                self.lease_view = LeaseManager(
+                    cluster_settings.get('lease_dir', 'input/.leases'),
+                    self.lease_node,
+                    ttl_seconds=cluster_settings.get('lease_ttl_seconds', 120)
+                )
+            held = self.lease_view.owns(video_path)
+        else:
+            return
+        if not held:
+            raise LeaseLost(f"Lost the lease on {video_path}; another node has taken it over, not publishing")
+    
+    def get_job_store(self) -> JobStore:
+        """Open the durable job store on first use (pool workers open it too, to publish progress)."""
+        if self.job_store is None:
+            db_path = self.settings.get('file_management', {}).get('job_store_path', 'state/jobs.db')
+            self.job_store = JobStore(db_path)
+        return self.job_store
+    
+    def get_readiness_tracker(self) -> FileReadinessTracker:
+        """Return the tracker that queues input files once they have finished writing."""
+        if self.readiness_tracker is None:
+            watch_settings = self.settings.get('file_watching', {})
+            self.readiness_tracker = FileReadinessTracker(
+                self.enqueue_detected_video,
+                quiet_period=watch_settings.get('quiet_period_seconds', 2),
+                poll_interval=watch_settings.get('poll_interval_seconds', 0.5),
+                require_done_marker=watch_settings.get('require_done_marker', False),
+                marker_suffix=watch_settings.get('done_marker_suffix', '.done')
+            )
+        return self.readiness_tracker
+    
+    def resume_interrupted_jobs(self):
+        """Put jobs that were running when the processor last stopped back in the queue."""
+        retry_settings = self.settings.get('advanced_settings', {})
+        max_attempts = max(1, retry_settings.get('max_retry_attempts', 3))
+        self.get_job_store().recover_interrupted(max_attempts)
+    
+    def get_dispatcher(self) -> DispatchQueue:
+        """Start the bounded dispatch queue and its consumer threads on first use."""
+        with self.pool_lock:
+            if self.dispatcher is None:
+                performance_settings = self.settings.get('performance_settings', {})
+                self.dispatcher = DispatchQueue(
+                    self._run_queued_jobs,
+                    workers=resolve_pool_size(self.settings),
+                    maxsize=performance_settings.get('dispatch_queue_size', 100),
+                    put_timeout=performance_settings.get('dispatch_put_timeout_seconds', 5)
+                )
+            return self.dispatcher
+    
+    def get_job_priority(self, entry: ScanEntry) -> float:
+        """Priority for the job store under the configured job_order; lower values are claimed first."""
+        watch_settings = self.settings.get('file_watching', {})
+        return job_priority(entry, watch_settings.get('job_order', 'fifo'), watch_settings.get('deadline_suffix', '.deadline'))
+    
+    def enqueue_video(self, video_path: str, overrides: Optional[dict] = None) -> Optional[int]:
+        """Record a video in the job store and hand it to the dispatcher. Returns the job id if queued."""
+        try:
+            stat = os.stat(video_path)
+        except FileNotFoundError:
+            return None
+        priority = self.get_job_priority(ScanEntry(video_path, stat.st_ino, stat.st_size, stat.st_mtime))
+        job_id = self.get_job_store().enqueue(video_path, priority, overrides)
+        if job_id is None:
+            logger.debug(f"Skipping {video_path}: already queued, running or processed")
+            return None
+        logger.info(f"Queued job {job_id}: {video_path}" + (" (with settings overrides)" if overrides else ""))
+        if not self.get_dispatcher().put(video_path):
+            # The job stays queued in the store; a consumer picks it up once the backlog drains
+            logger.warning(f"Dispatch queue saturated; job {job_id} will start when a worker frees up")
+        return job_id
+    
+    def enqueue_detected_video(self, video_path: str) -> Optional[int]:
+        """Queue a video found by the watcher, unless the job API is publishing it with its own overrides."""
+        if self.is_held(video_path):
+            logger.debug(f"Skipping {video_path}: being queued by the job API")
+            return None
+        return self.enqueue_video(video_path)
+    
+    @contextmanager
+    def hold_from_detection(self, video_path: str):
+        """Keep the watcher and input scans from queueing video_path during the block."""
+        path = os.path.abspath(video_path)
+        with self.pool_lock:
+            self.held_paths.add(path)
+        try:
+            yield
+        finally:
+            with self.pool_lock:
+                self.held_paths.discard(path)
+    
+    def is_held(self, video_path: str) -> bool:
+        with self.pool_lock:
+            return os.path.abspath(video_path) in self.held_paths
+    
+    def _run_queued_jobs(self, video_path: str):
+        """Dispatcher consumer: claim and run queued jobs until the store has none left."""
+        while True:
+            job = self.get_job_store().claim(self.worker_id)
+            if job is None:
+                return
+            if not self.acquire_lease(job):
+                continue
+            validating = False
+            retry_error = None
+            try:
+                with self.use_profile(job['path'], job['overrides']):
+                    # With deep validation the job store owns the retries, so validation failures and
+                    # render failures draw on the same max_retry_attempts budget
+                    store_retries = self.deep_validation_enabled()
+                estimate_mb = self.estimate_job_memory(job['path'])
+                with self.get_admission_controller().admit(estimate_mb, f"job {job['id']}") as waited:
+                    self.metrics.observe('video_stage_seconds', waited, stage='memory_wait')
+                    logger.info(f"Starting job {job['id']} (attempt {job['attempts']}, ~{estimate_mb:.0f}MB): {job['path']}")
+                    report = self.submit_video(job['path'], job['overrides'], 1 if store_retries else None).result()
+                if report.get('crashed'):
+                    retry_error = "Worker process died"
+                elif report['result'] and report.get('output'):
+                    # Checked on a validation thread so this consumer can start the next job right away
+                    self.start_validation(job, report['output'])
+                    validating = True
+                elif report['result']:
+                    self.finish_job(job, 'success')
                 else:
-                    logger.error(f"All retry attempts exhausted for {video_path}")
-                    return False
+                    outcome = (report.get('metrics') or {}).get('result', 'failed')
+                    if outcome == 'lease_lost':
+                        # The node that took the video over finishes it
+                        self.get_job_store().forget(job['id'])
+                    elif store_retries and outcome == 'failed':
+                        retry_error = "Processing failed"
+                    else:
+                        self.finish_job(job, outcome, "Processing failed or video was skipped")
+            except Exception as e:
+                # Never leave a claimed job running; the consumer carries on with the next one
+                logger.error(f"Job {job['id']} ({job['path']}) failed unexpectedly: {e}")
+                retry_error = f"Unexpected error: {e}"
+            finally:
+                # A job under validation keeps its lease until the validation thread finishes it
+                if not validating:
+                    self.release_lease(job['path'])
+            if retry_error is not None:
+                self.retry_job(job, retry_error)
+    
+    def start_validation(self, job: dict, output: dict):
+        """Validate a rendered output in the background."""
+        with self.pool_lock:
+            if self.validation_executor is None:
+                self.validation_executor = ThreadPoolExecutor(
+                    max_workers=resolve_pool_size(self.settings), thread_name_prefix="validate"
+                )
+            future = self.validation_executor.submit(self._validate_job, job, output)
+            self.pending_validations.add(future)
+        future.add_done_callback(self._validation_done)
+    
+    def _validation_done(self, future: Future):
+        with self.pool_lock:
+            self.pending_validations.discard(future)
+    
+    def _validate_job(self, job: dict, output: dict):
+        """Finish a job whose output passes validation; otherwise drop the output and retry or fail the job."""
+        retry_error = None
+        with self.use_profile(job['path'], job['overrides']):
+            try:
+                retry_error = self._finish_validated_job(job, output)
+            except Exception as e:
+                logger.error(f"Could not finish job {job['id']} ({job['path']}): {e}")
+                self.finish_job(job, 'failed', f"Finishing the validated output failed: {e}")
+            finally:
+                self.release_lease(job['path'])
+        # Requeued only after the lease is released, so whichever consumer claims the job can take it
+        if retry_error is not None:
+            self.retry_job(job, retry_error)
+    
+    def _finish_validated_job(self, job: dict, output: dict) -> Optional[str]:
+        """Publish a valid output or drop an invalid one. Returns the error to retry the job with, if any."""
+        started = time.monotonic()
+        try:
+            problems = validate_output(output['path'], **output['checks'])
+        except Exception as e:
+            problems = [f"validator error: {e}"]
+        self.metrics.observe('video_stage_seconds', time.monotonic() - started, stage='deep_validate')
+        
+        job_store = self.get_job_store()
+        if self.leases is not None and not self.leases.holds(job['path']):
+            # This node stalled past the lease TTL and another node took the video over; its output wins
+            logger.error(f"Lost the lease on {job['path']}; discarding {output['path']}")
+            try:
+                os.remove(output['path'])
+            except OSError as e:
+                logger.warning(f"Could not remove {output['path']}: {e}")
+            job_store.forget(job['id'])
+            return None
+        if not problems:
+            self.publish_output(output['path'], output['final_path'])
+            self.store_cached_output(output.get('cache_key'), output['final_path'], job['path'])
+            processed_path = self.get_unique_processed_path(job['path'])
+            self.move_to_processed(job['path'], processed_path)
+            self.finish_job(job, 'success')
+            logger.info(f"Successfully processed: {job['path']} -> {output['final_path']} (output validated)")
+            return None
+        
+        self.metrics.inc('video_validation_failures_total')
+        error = f"Output validation failed: {'; '.join(problems)}"
+        logger.error(f"{error} ({output['final_path']})")
+        try:
+            os.remove(output['path'])
+        except OSError as e:
+            logger.warning(f"Could not remove invalid output {output['path']}: {e}")
+        return error
+    
+    def retry_job(self, job: dict, error: str):
+        """Requeue a store job that failed, after a backoff, while it has attempts left under max_retry_attempts.
+        
+        Fails it otherwise.
+        """
+        with self.use_profile(job['path'], job['overrides']):
+            max_attempts = self.get_max_attempts()
+        if job['attempts'] < max_attempts:
+            backoff_seconds = 2 ** (job['attempts'] - 1)
+            logger.info(f"Attempt {job['attempts']}/{max_attempts} of job {job['id']} failed; requeueing in {backoff_seconds}s")
+            time.sleep(backoff_seconds)
+            self.metrics.observe('video_stage_seconds', backoff_seconds, stage='retry_backoff')
+            self.metrics.inc('video_job_retries_total')
+            self.get_job_store().requeue(job['id'], error)
+            self.get_dispatcher().put(job['path'])
+        else:
+            self.finish_job(job, 'failed', error)
+    
+    def finish_job(self, job: dict, result: str, error: Optional[str] = None):
+        """Record a store job's final state ('success', 'failed' or 'skipped') and count it in video_jobs_total."""
+        if result == 'success':
+            self.get_job_store().mark_done(job['id'])
+        else:
+            self.get_job_store().mark_failed(job['id'], error)
+        self.metrics.inc('video_jobs_total', result=result)
+    
+    def wait_for_jobs(self):
+        """Block until the dispatcher is idle and no output is still being validated."""
+        dispatcher = self.get_dispatcher()
+        while True:
+            dispatcher.join()
+            with self.pool_lock:
+                pending = list(self.pending_validations)
+            if not pending:
+                return
+            # A failed validation may requeue its job, so go round again
+            wait(pending)
     
     def process_existing_videos(self):
-        """Process any existing videos in the input folder."""
-        input_dir = Path("input")
-        video_files = [f for f in input_dir.iterdir() if f.is_file() and self.is_video_file(str(f))]
-        
-        if video_files:
-            logger.info(f"Found {len(video_files)} existing video(s) to process")
-            for video_file in video_files:
-                if str(video_file) not in self.processed_files:
-                    self.process_video(str(video_file))
-                    self.processed_files.add(str(video_file))
+        """Queue any existing videos in the input folder and wait for the backlog to finish."""
+        found, queued, seconds = self.scan_input_backlog()
+        if found:
+            logger.info(f"Found {found} existing video(s) in input folder, {queued} newly queued ({seconds:.2f}s)")
         else:
             logger.info("No existing videos found in input folder")
+        
+        self.wake_dispatcher()
+        self.wait_for_jobs()
+        if self.worker_pool is not None:
+            self.worker_pool.log_utilization()
+    
+    def wake_dispatcher(self):
+        """Wake every consumer; each drains the store, which also covers jobs requeued after a crash."""
+        dispatcher = self.get_dispatcher()
+        for path in self.get_job_store().queued_paths(limit=dispatcher.workers):
+            dispatcher.put(path)
+    
+    def scan_input_backlog(self):
+        """Queue ready videos from every input folder. Returns (found, newly queued, seconds)."""
+        tracker = self.get_readiness_tracker()
+        job_store = self.get_job_store()
+        batch_size = self.settings.get('file_watching', {}).get('scan_batch_size', 1000)
+        started = time.monotonic()
+        found = queued = 0
+        for batch in (batch for root in self.profiles.watch_roots()
+                      for batch in scan_videos(root, self.is_video_file, batch_size, recursive=True)):
+            found += len(batch)
+            ready = []
+            for entry in batch:
+                if self.is_held(entry.path):
+                    continue
+                # Files still being copied (or waiting for a marker) are handed to the tracker
+                if tracker.is_ready_now(entry.path, entry.mtime):
+                    ready.append((*entry, self.get_job_priority(entry)))
+                else:
+                    tracker.watch(entry.path)
+            queued += job_store.enqueue_many(ready)
+        return found, queued, time.monotonic() - started
 
 class VideoFileHandler(FileSystemEventHandler):
     def __init__(self, processor: VideoProcessor):
         self.processor = processor
+        self.tracker = processor.get_readiness_tracker()
+        self.use_close_events = processor.settings.get('file_watching', {}).get('use_close_events', True)
+        self.watch_roots = processor.profiles.watch_roots()
+    
+    def is_hidden(self, path: str, is_directory: bool = False) -> bool:
+        """Events in hidden folders (uploads in progress, leases) are skipped, as the backlog scan skips them."""
+        return in_hidden_folder(path, self.watch_roots, is_directory)
+    
+    def scan_folder(self, folder: str, complete: bool):
+        """Pick up the videos in a folder created or moved into the input; no events arrive for what it already holds."""
+        found = 0
+        try:
+            for batch in scan_videos(folder, self.processor.is_video_file, recursive=True):
+                for entry in batch:
+                    if complete:
+                        self.tracker.mark_closed(entry.path)
+                    else:
+                        self.tracker.watch(entry.path)
+                found += len(batch)
+        except OSError as e:
+            logger.warning(f"Could not scan new folder {folder}: {e}")
+        if found:
+            logger.info(f"New folder {folder} holds {found} video file(s)")
     
     def on_created(self, event):
-        if not event.is_directory:
-            file_path = event.src_path
-            if self.processor.is_video_file(file_path):
-                logger.info(f"New video file detected: {file_path}")
-                # Wait a bit to ensure file is fully written
-                time.sleep(2)
-                if file_path not in self.processor.processed_files:
-                    self.processor.process_video(file_path)
-                    self.processor.processed_files.add(file_path)
+        if self.is_hidden(event.src_path, event.is_directory):
+            return
+        if event.is_directory:
+            # Files can land in a new folder before the watch on it is in place
+            self.scan_folder(event.src_path, complete=False)
+            return
+        file_path = event.src_path
+        if self.processor.is_video_file(file_path):
+            logger.info(f"New video file detected: {file_path}")
+            self.tracker.watch(file_path)
+        else:
+            self.tracker.marker_seen(file_path)
+    
+    def on_modified(self, event):
+        if not event.is_directory and self.processor.is_video_file(event.src_path) and not self.is_hidden(event.src_path):
+            self.tracker.watch(event.src_path)
+    
+    def on_closed(self, event):
+        if (self.use_close_events and not event.is_directory and self.processor.is_video_file(event.src_path)
+                and not self.is_hidden(event.src_path)):
+            self.tracker.mark_closed(event.src_path)
+    
+    def on_moved(self, event):
+        if self.is_hidden(event.dest_path, event.is_directory):
+            return
+        # A rename into the folder delivers a complete file, or a folder of complete files
+        if event.is_directory:
+            self.scan_folder(event.dest_path, complete=True)
+        elif self.processor.is_video_file(event.dest_path):
+            logger.info(f"New video file detected: {event.dest_path}")
+            self.tracker.mark_closed(event.dest_path)
+        else:
+            self.tracker.marker_seen(event.dest_path)
 
 def main():
     """Main function to run the video processor with file watching."""
@@ -409,19 +1505,29 @@ def main():
         # Initialize processor
         processor = VideoProcessor()
         
-        # Process any existing videos
-        processor.process_existing_videos()
+        # Resume work interrupted by a crash or restart, then process existing videos
+        processor.start_metrics_server()
+        processor.get_encoder()
+        processor.resume_interrupted_jobs()
+        processor.start_cluster()
+        processor.remove_stale_checkpoints()
+        processor.remove_partial_outputs()
+        processor.get_readiness_tracker().start()
+        processor.start_api()
         
-        # Set up file watcher
+        # Set up file watcher before draining the backlog, so videos arriving meanwhile are queued too
         event_handler = VideoFileHandler(processor)
         observer = Observer()
-        observer.schedule(event_handler, path="input", recursive=False)
+        watch_roots = processor.profiles.watch_roots()
+        for root in watch_roots:
+            observer.schedule(event_handler, path=root, recursive=True)
         observer.start()
         
-        logger.info("Video processor started. Watching for new videos in 'input' folder...")
+        logger.info(f"Video processor started. Watching for new videos in {', '.join(watch_roots)} (recursive)...")
         logger.info("Press Ctrl+C to stop")
         
         try:
+            processor.process_existing_videos()
             while True:
                 time.sleep(1)
         except KeyboardInterrupt:
@@ -429,6 +1535,8 @@ def main():
             logger.info("Stopping video processor...")
         
         observer.join()
+        processor.get_readiness_tracker().stop()
+        processor.shutdown()
         
     except Exception as e:
         logger.error(f"Fatal error: {e}")
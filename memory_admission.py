@@ -0,0 +1,104 @@
+"""
+Memory-aware admission control for branding jobs.
+
+Every job gets a projected memory footprint from its resolution, frame rate
+and duration. A job starts only when the footprints of all running jobs plus
+its own fit within the memory budget and the machine has that much memory
+available. Jobs that do not fit wait on a condition variable and are woken as
+soon as a running job releases its reservation.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# MoviePy keeps a handful of RGB frames alive per composited layer while rendering
+MOVIEPY_FRAME_BUFFERS = 6
+# x264's default rate-control lookahead plus B-frames and references, held as YUV 4:2:0
+ENCODER_FRAME_BUFFERS = 50
+# Muxer sample tables and timestamps grow with the number of frames written
+BYTES_PER_OUTPUT_FRAME = 64
+
+
+def estimate_job_memory_mb(video_info: dict, settings: dict) -> float:
+    """Project the peak memory of one branding job from its video's size, fps and duration."""
+    performance_settings = settings.get('performance_settings', {})
+    width, height = video_info['size']
+    pixels = width * height
+    fps = settings.get('output_settings', {}).get('fps') or video_info['fps'] or 30
+
+    encoders = 1
+    if performance_settings.get('encode_mode') == 'segmented' and performance_settings.get('parallel_chunk_encoding'):
+        encoders = max(1, performance_settings.get('chunk_workers', 0) or 2)
+
+    frame_bytes = pixels * 3 * MOVIEPY_FRAME_BUFFERS + pixels * 1.5 * ENCODER_FRAME_BUFFERS * encoders
+    index_bytes = video_info['duration'] * fps * BYTES_PER_OUTPUT_FRAME
+    overhead_mb = performance_settings.get('job_memory_overhead_mb', 200)
+    return overhead_mb + (frame_bytes + index_bytes) / MB
+
+
+class MemoryAdmissionController:
+    """Admits jobs while their projected footprints fit the memory budget."""
+
+    def __init__(self, budget_mb: float, system_reserve_mb: float = 256, recheck_seconds: float = 5.0):
+        self.budget_mb = budget_mb
+        self.system_reserve_mb = system_reserve_mb
+        # Memory used by other programs can go down without anyone notifying us, so waits time out and re-check
+        self.recheck_seconds = recheck_seconds
+        self.condition = threading.Condition()
+        self.reserved_mb = 0.0
+        self.running = 0
+        self.waiting = 0
+
+    def _fits(self, estimate_mb: float) -> bool:
+        if self.running == 0:
+            # Never starve a job that is larger than the whole budget
+            return True
+        if self.reserved_mb + estimate_mb > self.budget_mb:
+            return False
+        available_mb = psutil.virtual_memory().available / MB
+        return estimate_mb <= available_mb - self.system_reserve_mb
+
+    @contextmanager
+    def admit(self, estimate_mb: float, label: str = '') -> Iterator[float]:
+        """Block until the job fits, hold its reservation for the block and yield the seconds waited."""
+        started = time.monotonic()
+        with self.condition:
+            self.waiting += 1
+            try:
+                if not self._fits(estimate_mb):
+                    logger.info(
+                        f"Holding {label} (~{estimate_mb:.0f}MB): {self.reserved_mb:.0f}MB of "
+                        f"{self.budget_mb:.0f}MB reserved by {self.running} running job(s)"
+                    )
+                    while not self._fits(estimate_mb):
+                        self.condition.wait(timeout=self.recheck_seconds)
+            finally:
+                self.waiting -= 1
+            self.reserved_mb += estimate_mb
+            self.running += 1
+        try:
+            yield time.monotonic() - started
+        finally:
+            with self.condition:
+                self.reserved_mb -= estimate_mb
+                self.running -= 1
+                self.condition.notify_all()
+
+    def stats(self) -> dict:
+        """Return the current reservation, running and waiting job counts."""
+        with self.condition:
+            return {
+                'budget_mb': self.budget_mb,
+                'reserved_mb': self.reserved_mb,
+                'running': self.running,
+                'waiting': self.waiting
+            }
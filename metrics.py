@@ -0,0 +1,205 @@
+"""
+Processing metrics in Prometheus text format.
+
+Each processing attempt records stage timings, frame and byte counts into a
+JobMetrics collector in the process that ran it. Pool workers return the
+collected dict with their job result, and the parent process folds it into
+one MetricsRegistry. The registry is served at /metrics by a small
+http.server thread next to the watcher loop.
+"""
+
+import time
+import logging
+import resource
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# name -> (type, help)
+METRICS = {
+    'video_jobs_total': ('counter', 'Videos handled, by result'),
+    'video_job_retries_total': ('counter', 'Processing attempts that were retried'),
+    'video_stage_seconds': ('summary', 'Time spent in each processing stage'),
+    'video_job_seconds': ('summary', 'Wall time per video, including retries'),
+    'video_encoded_frames_total': ('counter', 'Frames written to output videos'),
+    'video_last_encode_fps': ('gauge', 'Encode speed of the most recent video in frames per second'),
+    'video_bytes_in_total': ('counter', 'Bytes of input video read'),
+    'video_bytes_out_total': ('counter', 'Bytes of output video written'),
+    'video_validation_failures_total': ('counter', 'Outputs rejected by deep validation'),
+    'video_output_cache_hits_total': ('counter', 'Videos served from the output cache instead of being encoded'),
+    'video_memory_high_water_bytes': ('gauge', 'Highest peak RSS reported by any processing process'),
+    'video_memory_reserved_bytes': ('gauge', 'Projected memory reserved by running jobs'),
+    'video_admission_waiting_jobs': ('gauge', 'Jobs waiting for memory to be admitted'),
+    'video_dispatch_queue_depth': ('gauge', 'Paths waiting in the dispatch queue'),
+    'video_dispatch_queue_capacity': ('gauge', 'Capacity of the dispatch queue'),
+    'video_dispatch_rejected_total': ('counter', 'Paths rejected because the dispatch queue stayed full'),
+    'video_dispatch_blocked_seconds_total': ('counter', 'Time producers waited on a full dispatch queue'),
+    'video_job_store_jobs': ('gauge', 'Jobs in the job store, by state'),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def peak_rss_bytes() -> int:
+    """Peak RSS of this process or of its largest finished child (e.g. ffmpeg), whichever is higher."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux
+    return max(own, children) * 1024
+
+
+class JobMetrics:
+    """Stage timer and counters for one video, filled in by the process that renders it."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.current: Optional[str] = None
+        self.current_started = 0.0
+        self.values: Dict[str, Any] = {'attempts': 0}
+
+    def stage(self, name: Optional[str]):
+        """End the running stage, if any, and start timing the next one (None just ends it)."""
+        now = time.monotonic()
+        if self.current is not None:
+            self.stages[self.current] = self.stages.get(self.current, 0.0) + now - self.current_started
+        self.current = name
+        self.current_started = now
+
+    def set(self, key: str, value: Any):
+        self.values[key] = value
+
+    def finish(self, result: str) -> Dict[str, Any]:
+        """Close the running stage and return a picklable summary of the job."""
+        self.stage(None)
+        return {
+            **self.values,
+            'result': result,
+            'stages': dict(self.stages),
+            'seconds': time.monotonic() - self.started,
+            'peak_rss_bytes': peak_rss_bytes()
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and summaries rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values: Dict[str, Dict[LabelKey, Any]] = {name: {} for name in METRICS}
+        self.collectors: List[Callable[['MetricsRegistry'], None]] = []
+
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self.lock:
+            series = self.values[name]
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self.lock:
+            self.values[name][self._key(labels)] = value
+
+    def max_gauge(self, name: str, value: float, **labels):
+        with self.lock:
+            series = self.values[name]
+            key = self._key(labels)
+            series[key] = max(series.get(key, 0), value)
+
+    def observe(self, name: str, value: float, **labels):
+        with self.lock:
+            series = self.values[name]
+            key = self._key(labels)
+            total, count = series.get(key, (0.0, 0))
+            series[key] = (total + value, count + 1)
+
+    def add_collector(self, collector: Callable[['MetricsRegistry'], None]):
+        """Register a callback that refreshes gauges right before each scrape."""
+        self.collectors.append(collector)
+
+    def record_job(self, job: Optional[Dict[str, Any]]):
+        """Fold a finished job's JobMetrics summary into the registry."""
+        if not job:
+            return
+        # video_jobs_total is counted by the dispatcher once the job's final state is known (after validation)
+        if job.get('attempts', 0) > 1:
+            self.inc('video_job_retries_total', job['attempts'] - 1)
+        self.observe('video_job_seconds', job['seconds'])
+        for stage, seconds in job['stages'].items():
+            self.observe('video_stage_seconds', seconds, stage=stage)
+        self.inc('video_bytes_in_total', job.get('bytes_in', 0))
+        self.inc('video_bytes_out_total', job.get('bytes_out', 0))
+        if job.get('cache_hit'):
+            self.inc('video_output_cache_hits_total')
+        self.max_gauge('video_memory_high_water_bytes', job['peak_rss_bytes'])
+        encode_seconds = job['stages'].get('encode')
+        if job['result'] == 'success' and job.get('frames'):
+            self.inc('video_encoded_frames_total', job['frames'])
+            if encode_seconds:
+                self.set_gauge('video_last_encode_fps', job['frames'] / encode_seconds)
+
+    @staticmethod
+    def _format_labels(key: LabelKey) -> str:
+        return '{' + ','.join(f'{k}="{v}"' for k, v in key) + '}' if key else ''
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        self.max_gauge('video_memory_high_water_bytes', peak_rss_bytes())
+
+        lines = []
+        with self.lock:
+            for name, (metric_type, help_text) in METRICS.items():
+                series = self.values[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in sorted(series.items()):
+                    if metric_type == 'summary':
+                        total, count = value
+                        lines.append(f"{name}_sum{self._format_labels(key)} {total}")
+                        lines.append(f"{name}_count{self._format_labels(key)} {count}")
+                    else:
+                        lines.append(f"{name}{self._format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves a registry at /metrics from a background thread."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9108):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics request: {format % args}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logger.info(f"Metrics available at http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,146 @@
+"""
+Content-addressed cache of finished outputs.
+
+The same source file is often uploaded again under another name. Each
+accepted output is therefore kept under a key made of:
+
+- a fast hash of the input: its size plus evenly spaced chunks of its bytes,
+  so a multi-gigabyte file is identified from a few megabytes of reads,
+- a hash of the effective render settings and of the logo files.
+
+A later job whose input and settings produce the same key gets a hard link to
+the cached output (a copy across filesystems) instead of an encode. Entries
+are hard links too, so caching an output costs no extra space while the
+output itself still exists. Outputs must therefore not be edited in place.
+The cache keeps at most max_entries outputs and evicts the least recently
+used one first.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_CHUNKS = 8
+SAMPLE_BYTES = 1024 * 1024
+
+
+def content_hash(path: str, chunks: int = SAMPLE_CHUNKS, chunk_bytes: int = SAMPLE_BYTES) -> str:
+    """Hash the file size and evenly spaced chunks of the file (all of it when it is small)."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        if size <= chunks * chunk_bytes:
+            for block in iter(lambda: f.read(chunk_bytes), b''):
+                digest.update(block)
+        else:
+            # First and last chunk included: container headers and trailers differ even between similar encodes
+            step = (size - chunk_bytes) / (chunks - 1)
+            for index in range(chunks):
+                f.seek(int(index * step))
+                digest.update(f.read(chunk_bytes))
+    return digest.hexdigest()
+
+
+def settings_hash(render_inputs: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(render_inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def link_or_copy(source: str, destination: str):
+    """Hard-link source to destination, copying when the two are on different filesystems."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class OutputCache:
+    """Stores accepted outputs by content key and hands them out again for identical jobs."""
+
+    def __init__(self, cache_dir: str, max_entries: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(input_hash: str, render_hash: str) -> str:
+        return hashlib.sha256(f"{input_hash}:{render_hash}".encode()).hexdigest()[:32]
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.mp4", f"{base}.json"
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the cached output for key, or None. A hit counts as a use for eviction."""
+        entry, meta = self._paths(key)
+        try:
+            with open(meta) as f:
+                size = json.load(f)['size']
+            if os.path.getsize(entry) != size:
+                raise ValueError("size changed")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding damaged output cache entry {key}: {e}")
+            self._remove(key)
+            return None
+        # The metadata file's mtime is the entry's last use
+        os.utime(meta)
+        return entry
+
+    def store(self, key: str, output_path: str, source: str):
+        """Add an accepted output under key, then evict down to max_entries."""
+        entry, meta = self._paths(key)
+        temp = f"{entry}.{uuid.uuid4().hex}.tmp"
+        link_or_copy(output_path, temp)
+        os.replace(temp, entry)
+        if os.path.exists(temp):
+            # rename() leaves both names in place when they already link the same file
+            os.remove(temp)
+        # Workers may store the same key at once, so each writes its metadata under its own temp name
+        fd, meta_temp = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'source': source, 'output': output_path, 'size': os.path.getsize(entry),
+                           'stored_at': time.time()}, f)
+            os.replace(meta_temp, meta)
+        finally:
+            if os.path.exists(meta_temp):
+                os.remove(meta_temp)
+        self.evict()
+
+    def _remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self) -> int:
+        """Drop least recently used entries beyond max_entries. Returns how many were removed."""
+        if not self.max_entries:
+            return 0
+        with self.lock:
+            entries = []
+            for meta in Path(self.cache_dir).glob('*.json'):
+                try:
+                    entries.append((meta.stat().st_mtime, meta.stem))
+                except FileNotFoundError:
+                    continue
+            entries.sort()
+            excess = entries[:max(0, len(entries) - self.max_entries)]
+            for _, key in excess:
+                self._remove(key)
+        if excess:
+            logger.info(f"Evicted {len(excess)} output cache entr{'y' if len(excess) == 1 else 'ies'}")
+        return len(excess)
@@ -0,0 +1,75 @@
+"""
+Structural checks for rendered outputs.
+
+A file that exists and is not empty can still be truncated, lose its audio
+track or fail to decode where two segments were joined. The validator checks:
+
+- the container duration against the expected duration,
+- that audio is present if the input had it,
+- the video frame count, read from packet headers,
+- optionally, that a frame decodes cleanly just after each segment boundary.
+
+Each check costs one short FFmpeg/ffprobe run. None of them decodes the whole
+file.
+"""
+
+import logging
+import subprocess
+from typing import Iterable, List, Optional
+
+from moviepy.config import FFMPEG_BINARY
+
+from video_probe import probe_video, count_frames
+
+logger = logging.getLogger(__name__)
+
+
+def decode_error_at(video_path: str, time_seconds: float) -> Optional[str]:
+    """Decode one frame at time_seconds. Returns the decoder's complaint, or None if the frame is clean."""
+    result = subprocess.run(
+        [FFMPEG_BINARY, '-hide_banner', '-nostdin', '-v', 'error', '-ss', f"{time_seconds:.3f}",
+         '-i', video_path, '-map', '0:v:0', '-frames:v', '1', '-f', 'null', '-'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0 or result.stderr.strip():
+        return result.stderr.strip()[-200:] or f"exit status {result.returncode}"
+    return None
+
+
+def validate_output(
+    output_path: str,
+    expected_duration: float,
+    expect_audio: bool,
+    expected_frames: Optional[int] = None,
+    sample_times: Iterable[float] = (),
+    duration_tolerance: float = 0.5,
+    frame_tolerance: float = 0.01
+) -> List[str]:
+    """Return a list of problems found in the output; an empty list means it passed."""
+    try:
+        info = probe_video(output_path)
+    except Exception as e:
+        return [f"container cannot be read: {e}"]
+
+    problems = []
+    if abs(info['duration'] - expected_duration) > duration_tolerance:
+        problems.append(f"duration is {info['duration']:.2f}s, expected {expected_duration:.2f}s")
+    if expect_audio and not info['audio']:
+        problems.append("audio track is missing")
+
+    if expected_frames:
+        try:
+            frames = count_frames(output_path)
+            # Segment joins and rounding at fractional frame rates can shift the count by a frame or two
+            allowed = max(2, int(expected_frames * frame_tolerance))
+            if abs(frames - expected_frames) > allowed:
+                problems.append(f"has {frames} frames, expected about {expected_frames}")
+        except Exception as e:
+            problems.append(f"frames cannot be counted: {e}")
+
+    for time_seconds in sample_times:
+        if 0 <= time_seconds < info['duration']:
+            error = decode_error_at(output_path, time_seconds)
+            if error:
+                problems.append(f"frame at {time_seconds:.2f}s does not decode: {error}")
+    return problems
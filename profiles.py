@@ -0,0 +1,87 @@
+"""
+Per-folder branding profiles.
+
+One processor serves several brands. Each profile maps an input folder to a
+settings file. That file holds only the keys that differ from settings.json
+(logos, codec, timings, ...), and it is merged over the base settings. Every
+profile gets its own output and processed folders. A video belongs to the
+profile with the deepest input folder that contains it. Videos outside every
+profile folder use the base settings. The worker pool and job store are
+shared by all profiles. The logo asset and output caches are shared too,
+unless a profile sets its own cache folders.
+"""
+
+import os
+import copy
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = 'default'
+
+
+def deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """Return base with override applied; nested dicts are merged, everything else is replaced."""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+class ProfileResolver:
+    """Builds the settings of every profile and finds the profile of a video path."""
+
+    def __init__(self, settings: Dict[str, Any]):
+        file_management = settings.get('file_management', {})
+        base_input = file_management.get('input_dir', 'input')
+        base_output = file_management.get('output_dir', 'output')
+        base_processed = file_management.get('processed_dir', 'processed')
+
+        self.profiles: List[Dict[str, Any]] = [
+            {'name': DEFAULT_PROFILE, 'input_dir': base_input, 'settings': settings}
+        ]
+        for name, profile in settings.get('profiles', {}).items():
+            override = {}
+            if profile.get('settings_file'):
+                with open(profile['settings_file']) as f:
+                    override = json.load(f)
+            override.pop('profiles', None)
+            profile_settings = deep_merge(settings, override)
+            profile_settings.pop('profiles', None)
+            # Folders not set by the profile file default to a subfolder named after the profile
+            folders = profile_settings['file_management'] = dict(profile_settings.get('file_management', {}))
+            folders['input_dir'] = profile.get('input_dir') or os.path.join(base_input, name)
+            if 'output_dir' not in override.get('file_management', {}):
+                folders['output_dir'] = os.path.join(base_output, name)
+            if 'processed_dir' not in override.get('file_management', {}):
+                folders['processed_dir'] = os.path.join(base_processed, name)
+            self.profiles.append({'name': name, 'input_dir': folders['input_dir'], 'settings': profile_settings})
+
+        # Deepest folders first, so nested profile folders win over their parents
+        self.profiles.sort(key=lambda p: len(os.path.abspath(p['input_dir']).split(os.sep)), reverse=True)
+
+    def resolve(self, video_path: str) -> Dict[str, Any]:
+        """Return the profile whose input folder contains video_path (the default profile otherwise)."""
+        path = os.path.abspath(video_path)
+        for profile in self.profiles:
+            folder = os.path.abspath(profile['input_dir'])
+            if os.path.commonpath([path, folder]) == folder:
+                return profile
+        return self.get(DEFAULT_PROFILE)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return next(p for p in self.profiles if p['name'] == name)
+
+    def watch_roots(self) -> List[str]:
+        """Input folders to watch recursively, leaving out those already inside another root."""
+        folders = sorted({os.path.abspath(p['input_dir']) for p in self.profiles}, key=len)
+        roots: List[str] = []
+        for folder in folders:
+            if not any(os.path.commonpath([folder, root]) == root for root in roots):
+                roots.append(folder)
+        return [os.path.relpath(root) for root in roots]
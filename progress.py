@@ -0,0 +1,151 @@
+"""
+Per-job encode progress: frames done, current speed and ETA.
+
+The encoders of one job report how many frames they have written, each under
+its own part name: the MoviePy writer through a proglog logger, FFmpeg
+through `-progress`. Segmented jobs run several encoders, and chunk encoders
+run concurrently, so the parts are summed. A ticker thread turns the counts
+into a snapshot at a fixed interval and hands it to a callback (the job store
+in practice). It also writes a log line now and then, and warns when no frame
+has been written for a while. Reporting therefore costs the encoders no more
+than a counter update, however often they report.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from proglog import TqdmProgressBarLogger
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest interval in the smoothed frame rate
+FPS_SMOOTHING = 0.5
+
+
+class ProgressTracker:
+    """Sums frame counts from a job's encoders and publishes throttled snapshots."""
+
+    def __init__(self, name: str, total_frames: int, on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 interval_seconds: float = 2.0, log_interval_seconds: float = 15.0, stall_seconds: float = 120.0):
+        self.name = name
+        self.total_frames = max(1, total_frames)
+        self.on_update = on_update
+        self.interval_seconds = interval_seconds
+        self.log_interval_seconds = log_interval_seconds
+        self.stall_seconds = stall_seconds
+        self.lock = threading.Lock()
+        self.parts: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self.last_advance = self.started
+        self.last_frames = 0
+        self.last_tick = self.started
+        self.last_log = self.started
+        self.fps = 0.0
+        self.stall_warned = False
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def update(self, part: str, frames: int):
+        """Record that the encoder of this part has written frames frames so far."""
+        with self.lock:
+            self.parts[part] = frames
+
+    def part(self, name: str) -> Callable[[int], None]:
+        """Callback for one encoder, taking its running frame count."""
+        return lambda frames: self.update(name, frames)
+
+    def complete(self, part: str, frames: int):
+        """Mark a part as finished; counts reported by its sub-parts ("part/...") are folded into it."""
+        with self.lock:
+            for name in [name for name in self.parts if name.startswith(f"{part}/")]:
+                del self.parts[name]
+            self.parts[part] = frames
+
+    def reset(self):
+        """Forget all counts, e.g. before re-rendering with another encoder."""
+        with self.lock:
+            self.parts.clear()
+
+    def frames_done(self) -> int:
+        with self.lock:
+            return min(sum(self.parts.values()), self.total_frames)
+
+    def snapshot(self, final: bool = False) -> Dict[str, Any]:
+        """Current progress; also advances the smoothed frame rate. The final one reports the average rate."""
+        now = time.monotonic()
+        frames = self.frames_done()
+        elapsed = now - self.last_tick
+        if final:
+            self.fps = frames / max(now - self.started, 1e-6)
+        elif elapsed > 0:
+            rate = max(frames - self.last_frames, 0) / elapsed
+            self.fps = rate if self.last_frames == 0 else FPS_SMOOTHING * rate + (1 - FPS_SMOOTHING) * self.fps
+        if frames != self.last_frames:
+            self.last_advance = now
+            self.stall_warned = False
+        self.last_frames = frames
+        self.last_tick = now
+        remaining = self.total_frames - frames
+        return {
+            'frames_done': frames,
+            'total_frames': self.total_frames,
+            'percent': round(100.0 * frames / self.total_frames, 1),
+            'fps': round(self.fps, 1),
+            'eta_seconds': round(remaining / self.fps) if self.fps > 0 else None,
+            'elapsed_seconds': round(now - self.started, 1),
+            'stalled_seconds': round(now - self.last_advance, 1),
+            'updated_at': time.time()
+        }
+
+    def publish(self, final: bool = False):
+        progress = self.snapshot(final)
+        now = time.monotonic()
+        if final or now - self.last_log >= self.log_interval_seconds:
+            self.last_log = now
+            eta = f"{progress['eta_seconds']}s" if progress['eta_seconds'] is not None else "unknown"
+            logger.info(
+                f"Progress {self.name}: {progress['frames_done']}/{progress['total_frames']} frames "
+                f"({progress['percent']}%), {progress['fps']} fps, ETA {eta}"
+            )
+        if not final and not self.stall_warned and progress['stalled_seconds'] >= self.stall_seconds:
+            self.stall_warned = True
+            logger.warning(f"Encode of {self.name} has not written a frame for {progress['stalled_seconds']:.0f}s")
+        if self.on_update is not None:
+            try:
+                self.on_update(progress)
+            except Exception as e:
+                # Progress is informational; it must never fail the encode
+                logger.debug(f"Could not publish progress of {self.name}: {e}")
+
+    def _tick(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            self.publish()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._tick, name="progress", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop ticking and publish the final counts."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.publish(final=True)
+
+
+class FrameProgressLogger(TqdmProgressBarLogger):
+    """MoviePy logger that reports written frames to a callback, optionally keeping the console bar."""
+
+    def __init__(self, on_frames: Callable[[int], None], console: bool = False):
+        super().__init__(print_messages=console)
+        self.on_frames = on_frames
+        self.console = console
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        # write_videofile iterates the 'frame_index' bar once per frame it writes
+        if bar == 'frame_index' and attr == 'index':
+            self.on_frames(value + 1)
+        if self.console:
+            super().bars_callback(bar, attr, value, old_value)
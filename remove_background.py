@@ -5,47 +5,82 @@ Script to remove white background from static logo and create a transparent PNG.
 Defaults:
 - Input: assets/static_logo1.jpeg (or any provided path)
 - Output: assets/static_logo.png
+
+If the input is a directory, every image in it is converted into the output
+directory in one run. Batch mode (--batch globs or a --manifest file) converts
+many logos on a process pool and skips outputs whose source content, threshold
+and size are unchanged since the last run. --fit-settings pre-sizes logos to
+the logo_configuration dimensions, so the processor does not resize them at
+runtime.
 """
 
 from PIL import Image
+import numpy as np
+import argparse
+import hashlib
+import glob
+import json
 import os
-import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+DEFAULT_CACHE_FILE = "cache/logo_prep.json"
+
 
-def remove_white_background(input_path: str, output_path: str, threshold: int = 240) -> bool:
+def remove_white_background_array(rgba: np.ndarray, threshold: int = 240, softness: int = 0) -> np.ndarray:
+    """
+    Make near-white pixels of an RGBA array transparent, in place.
+
+    Args:
+        rgba (np.ndarray): H x W x 4 uint8 array
+        threshold (int): RGB threshold for considering pixels as white (0-255)
+        softness (int): Width of the alpha ramp below the threshold; 0 gives hard edges
+    """
+    rgb = rgba[..., :3]
+    # A pixel is only as white as its darkest channel
+    whiteness = np.minimum(np.minimum(rgba[..., 0], rgba[..., 1]), rgba[..., 2])
+
+    if softness <= 0:
+        transparent = whiteness > threshold
+        rgba[transparent] = (255, 255, 255, 0)
+        return rgba
+
+    # Alpha falls linearly from 1 at threshold + 1 - softness to 0 above the threshold
+    keep = np.clip((threshold + 1 - whiteness.astype(np.float32)) / softness, 0.0, 1.0)
+    transparent = keep == 0.0
+    edge = (keep < 1.0) & ~transparent
+
+    # Edge pixels are a blend of logo and white; remove the white so they don't leave a halo
+    factor = keep[edge][:, None]
+    rgb[edge] = np.clip((rgb[edge] - 255.0 * (1.0 - factor)) / factor, 0, 255).astype(np.uint8)
+    rgba[..., 3][edge] = (rgba[..., 3][edge] * keep[edge]).astype(np.uint8)
+    rgba[transparent] = (255, 255, 255, 0)
+    return rgba
+
+
+def remove_white_background(input_path: str, output_path: str, threshold: int = 240, softness: int = 0,
+                            size: Optional[Tuple[int, int]] = None) -> bool:
     """
     Remove white background from an image and make it transparent.
-    
+
     Args:
         input_path (str): Path to input image
         output_path (str): Path to save output image with transparency
         threshold (int): RGB threshold for considering pixels as white (0-255)
+        softness (int): Width of the anti-aliased alpha ramp in RGB levels; 0 gives hard edges
+        size (tuple): Optional (width, height) to resize the result to
     """
     try:
-        # Open the image
-        img = Image.open(input_path)
-        
-        # Convert to RGBA if not already
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-        
-        # Get image data
-        data = img.getdata()
-        
-        # Create new image data with transparency
-        new_data = []
-        for item in data:
-            # Check if pixel is close to white (high RGB values)
-            if item[0] > threshold and item[1] > threshold and item[2] > threshold:
-                # Make white pixels transparent
-                new_data.append((255, 255, 255, 0))
-            else:
-                # Keep other pixels as they are
-                new_data.append(item)
-        
-        # Create new image with transparency
-        new_img = Image.new('RGBA', img.size)
-        new_img.putdata(new_data)
-        
+        # Open the image as a writable RGBA array
+        with Image.open(input_path) as img:
+            rgba = np.array(img.convert('RGBA'))
+
+        remove_white_background_array(rgba, threshold, softness)
+        new_img = Image.fromarray(rgba, 'RGBA')
+        if size and new_img.size != tuple(size):
+            new_img = new_img.resize(tuple(size), Image.LANCZOS)
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
 
@@ -53,34 +88,174 @@ def remove_white_background(input_path: str, output_path: str, threshold: int =
         new_img.save(output_path, 'PNG')
         print(f"Successfully removed white background from {input_path}")
         print(f"Transparent logo saved as {output_path}")
-        
+
         return True
-        
+
     except Exception as e:
         print(f"Error processing image: {e}")
         return False
 
+
+def remove_white_background_dir(input_dir: str, output_dir: str, threshold: int = 240, softness: int = 0,
+                                jobs: int = 1, settings_path: Optional[str] = None) -> int:
+    """Convert every image in a directory to a transparent PNG in output_dir. Returns the number of failures."""
+    names = sorted(name for name in os.listdir(input_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+    tasks = [
+        {
+            'input': os.path.join(input_dir, name),
+            'output': os.path.join(output_dir, os.path.splitext(name)[0] + '.png'),
+            'threshold': threshold,
+            'softness': softness
+        }
+        for name in names
+    ]
+    return run_batch(tasks, jobs=jobs, cache_file=None, settings_path=settings_path)
+
+
+def file_sha256(path: str) -> str:
+    """Hash a file's content in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_logo_size(input_path: str, settings_path: str, logo: str = 'static_logo') -> Tuple[int, int]:
+    """Return the size a logo will be displayed at according to settings.json."""
+    from asset_cache import logo_target_size
+
+    with open(settings_path) as f:
+        logo_config = json.load(f).get('logo_configuration', {}).get(logo, {})
+    with Image.open(input_path) as img:
+        return logo_target_size(logo_config, img.size, 80)
+
+
+def tasks_from_manifest(manifest_path: str, defaults: dict) -> List[dict]:
+    """Read batch tasks from a JSON manifest: a list of {"input", "output", "threshold", "softness"} objects."""
+    with open(manifest_path) as f:
+        entries = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    tasks = []
+    for entry in entries:
+        task = {**defaults, **entry}
+        # Relative paths in a manifest are relative to the manifest itself
+        task['input'] = os.path.join(base_dir, task['input'])
+        if task.get('output'):
+            task['output'] = os.path.join(base_dir, task['output'])
+        tasks.append(task)
+    return tasks
+
+
+def tasks_from_patterns(patterns: List[str], defaults: dict) -> List[dict]:
+    """Expand glob patterns (and plain paths) into batch tasks."""
+    tasks = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or ([pattern] if os.path.isfile(pattern) else [])
+        if not matches:
+            print(f"Warning: no files match {pattern}")
+        for path in matches:
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                tasks.append({**defaults, 'input': path})
+    return tasks
+
+
+def _prepare_logo(task: dict) -> bool:
+    """Process-pool entry point for one batch task."""
+    return remove_white_background(
+        task['input'], task['output'], task.get('threshold', 240), task.get('softness', 0), task.get('size')
+    )
+
+
+def run_batch(tasks: List[dict], jobs: int = 1, cache_file: Optional[str] = DEFAULT_CACHE_FILE,
+              output_dir: Optional[str] = None, force: bool = False, settings_path: Optional[str] = None) -> int:
+    """Run batch tasks, skipping unchanged ones. Returns the number of failures."""
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file) as f:
+            cache = json.load(f)
+
+    pending = []
+    skipped = 0
+    for task in tasks:
+        if not task.get('output'):
+            name = os.path.splitext(os.path.basename(task['input']))[0] + '.png'
+            task['output'] = os.path.join(output_dir or os.path.dirname(task['input']) or '.', name)
+        if os.path.abspath(task['output']) == os.path.abspath(task['input']):
+            print(f"Error: refusing to overwrite source {task['input']}; set an output path")
+            continue
+        if settings_path and not task.get('size'):
+            task['size'] = settings_logo_size(task['input'], settings_path, task.get('logo', 'static_logo'))
+        task['fingerprint'] = {
+            'source_sha256': file_sha256(task['input']),
+            'threshold': task.get('threshold', 240),
+            'softness': task.get('softness', 0),
+            'size': list(task['size']) if task.get('size') else None
+        }
+        key = os.path.abspath(task['output'])
+        if not force and os.path.exists(task['output']) and cache.get(key) == task['fingerprint']:
+            skipped += 1
+            continue
+        pending.append(task)
+
+    failures = len(tasks) - skipped - len(pending)
+    if pending:
+        with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(pending)))) as executor:
+            for task, ok in zip(pending, executor.map(_prepare_logo, pending)):
+                if ok:
+                    cache[os.path.abspath(task['output'])] = task['fingerprint']
+                else:
+                    failures += 1
+
+    if cache_file:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        partial_path = f"{cache_file}.{os.getpid()}.part"
+        with open(partial_path, 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+        os.replace(partial_path, cache_file)
+
+    print(f"Batch complete: {len(pending) - failures} converted, {skipped} unchanged, {failures} failed")
+    return failures
+
+
 def main():
-    # CLI args: input [output]
     # Defaults align with project assets and processor expectations
-    default_input = "assets/static_logo1.jpeg"
-    default_output = "assets/static_logo.png"
+    parser = argparse.ArgumentParser(description="Remove the white background from logo images.")
+    parser.add_argument('input', nargs='?', default="assets/static_logo1.jpeg", help="Image file or directory of images")
+    parser.add_argument('output', nargs='?', help="Output PNG, or output directory for a directory input")
+    parser.add_argument('--threshold', type=int, default=240, help="RGB level above which pixels count as white")
+    parser.add_argument('--softness', type=int, default=0, help="Width of the anti-aliased edge ramp (0 = hard edges)")
+    parser.add_argument('--batch', nargs='+', metavar='GLOB', help="Convert every image matching these glob patterns")
+    parser.add_argument('--manifest', help="JSON list of {input, output, threshold, softness} entries to convert")
+    parser.add_argument('--output-dir', help="Output directory for batch entries without an explicit output")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes for batch mode")
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE, help="Where batch mode records what it converted")
+    parser.add_argument('--force', action='store_true', help="Convert batch entries even if unchanged")
+    parser.add_argument('--fit-settings', nargs='?', const='settings.json', metavar='SETTINGS',
+                        help="Resize to the static logo size in settings.json (default: settings.json)")
+    args = parser.parse_args()
 
-    args = sys.argv[1:]
-    if len(args) >= 1:
-        input_logo = args[0]
-    else:
-        input_logo = default_input
-    if len(args) >= 2:
-        output_logo = args[1]
-    else:
-        output_logo = default_output
+    if args.batch or args.manifest:
+        defaults = {'threshold': args.threshold, 'softness': args.softness}
+        tasks = tasks_from_patterns(args.batch or [], defaults)
+        if args.manifest:
+            tasks += tasks_from_manifest(args.manifest, defaults)
+        failures = run_batch(tasks, args.jobs, args.cache_file, args.output_dir, args.force, args.fit_settings)
+        raise SystemExit(1 if failures else 0)
 
+    input_logo = args.input
     if not os.path.exists(input_logo):
         print(f"Error: Input file {input_logo} not found!")
         return
 
-    success = remove_white_background(input_logo, output_logo)
+    if os.path.isdir(input_logo):
+        output_dir = args.output or os.path.join(input_logo, 'transparent')
+        remove_white_background_dir(input_logo, output_dir, args.threshold, args.softness, args.jobs, args.fit_settings)
+        return
+
+    size = settings_logo_size(input_logo, args.fit_settings) if args.fit_settings else None
+    output_logo = args.output or "assets/static_logo.png"
+    success = remove_white_background(input_logo, output_logo, args.threshold, args.softness, size)
     if success:
         print("\nLogo processing completed successfully!")
         print(f"Original: {input_logo}")
@@ -0,0 +1,136 @@
+"""
+Checkpointed intermediate segments for resumable segmented encoding.
+
+Intro, middle (or middle chunks) and outro are written into a per-job
+directory whose name depends only on the input path. Each finished piece is
+checked: the file must probe, and its duration must match what was asked for.
+It is then recorded in manifest.json with its size. A retry, or a restart
+after a crash, re-encodes only the pieces that are missing, truncated or
+unreadable. The manifest also stores a fingerprint of the input file and the
+render settings, and pieces from a different version of either are discarded.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Any
+
+from video_probe import probe_video
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def checkpoint_dir_name(video_path: str) -> str:
+    """Stable directory name for a job: the same input always maps to the same directory."""
+    digest = hashlib.sha256(os.path.abspath(video_path).encode()).hexdigest()[:12]
+    return f"{Path(video_path).stem}_{digest}"
+
+
+def fingerprint(video_path: str, render_inputs: Dict[str, Any]) -> str:
+    """Hash the input file version together with everything that shapes the rendered pieces."""
+    stat = os.stat(video_path)
+    material = json.dumps({
+        'input': [os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns],
+        'render': render_inputs
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def remove_stale(temp_dir: str, max_age_hours: float) -> int:
+    """Delete checkpoint directories whose manifest has not changed for max_age_hours. Returns the count removed."""
+    if not os.path.isdir(temp_dir):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in Path(temp_dir).iterdir():
+        manifest = entry / MANIFEST_NAME
+        if entry.is_dir() and manifest.exists() and manifest.stat().st_mtime < cutoff:
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} stale checkpoint director{'y' if removed == 1 else 'ies'} from {temp_dir}")
+    return removed
+
+
+class SegmentCheckpoints:
+    """Tracks which intermediate pieces of a job are complete and valid."""
+
+    def __init__(self, job_dir: str, job_fingerprint: str, duration_tolerance: float = 0.25):
+        self.job_dir = job_dir
+        self.manifest_path = os.path.join(job_dir, MANIFEST_NAME)
+        self.duration_tolerance = duration_tolerance
+        self.lock = threading.Lock()
+        os.makedirs(job_dir, exist_ok=True)
+
+        manifest = None
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if manifest is None or manifest.get('fingerprint') != job_fingerprint:
+            if manifest is not None:
+                logger.info(f"Input or settings changed since the last attempt; discarding checkpoints in {job_dir}")
+            for entry in Path(job_dir).iterdir():
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink()
+            manifest = {'fingerprint': job_fingerprint, 'pieces': {}}
+        self.manifest = manifest
+        self._save()
+
+    def _save(self):
+        partial_path = f"{self.manifest_path}.part"
+        with open(partial_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(partial_path, self.manifest_path)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.job_dir, name)
+
+    def _probe_duration(self, path: str) -> float:
+        return probe_video(path)['duration']
+
+    def is_complete(self, name: str, expected_duration: float) -> bool:
+        """True if the piece was recorded and its file still matches the record and plays for the expected time."""
+        with self.lock:
+            entry = self.manifest['pieces'].get(name)
+        path = self.path(name)
+        if entry is None or not os.path.exists(path) or os.path.getsize(path) != entry['size']:
+            return False
+        try:
+            return abs(self._probe_duration(path) - expected_duration) <= self.duration_tolerance
+        except Exception:
+            return False
+
+    def commit(self, name: str, expected_duration: float):
+        """Validate a freshly written piece and record it in the manifest."""
+        path = self.path(name)
+        duration = self._probe_duration(path)
+        if abs(duration - expected_duration) > self.duration_tolerance:
+            raise RuntimeError(f"Segment {name} is {duration:.2f}s long, expected {expected_duration:.2f}s")
+        with self.lock:
+            self.manifest['pieces'][name] = {'size': os.path.getsize(path), 'duration': duration}
+            self._save()
+
+    def run(self, name: str, expected_duration: float, build: Callable[[str], None]) -> str:
+        """Return the path of a valid piece, building it only if no valid checkpoint exists."""
+        path = self.path(name)
+        if self.is_complete(name, expected_duration):
+            logger.info(f"Reusing checkpointed segment {name}")
+            return path
+        with self.lock:
+            self.manifest['pieces'].pop(name, None)
+        if os.path.exists(path):
+            os.remove(path)
+        build(path)
+        self.commit(name, expected_duration)
+        return path
@@ -0,0 +1,73 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import cluster_lease
+from cluster_lease import LeaseManager
+
+
+class TwoNodeLeaseTest(unittest.TestCase):
+    """Two nodes sharing one lease folder, as on a shared input mount."""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.work_dir.cleanup)
+        lease_dir = os.path.join(self.work_dir.name, '.leases')
+        self.video = os.path.join(self.work_dir.name, 'clip.mp4')
+        self.node_a = LeaseManager(lease_dir, 'node-a', ttl_seconds=60)
+        self.node_b = LeaseManager(lease_dir, 'node-b', ttl_seconds=60)
+        self.assertTrue(self.node_a.acquire(self.video))
+        self.lease = self.node_a.lease_path(self.video)
+
+    def expire(self):
+        old = time.time() - 120
+        os.utime(self.lease, (old, old))
+
+    def test_live_lease_is_not_taken(self):
+        self.assertFalse(self.node_b.acquire(self.video))
+        self.assertTrue(self.node_a.holds(self.video))
+
+    def test_expired_lease_is_taken_over(self):
+        self.expire()
+        self.assertTrue(self.node_b.acquire(self.video))
+        self.node_a.renew()
+        self.assertFalse(self.node_a.holds(self.video))
+        self.assertNotIn(self.video, self.node_a.held)
+        self.assertTrue(self.node_b.holds(self.video))
+
+    def test_renew_keeps_lease_while_reclaim_checks_it(self):
+        # Node B saw the lease as expired just before node A renewed it; while B has it renamed
+        # to its tombstone, A's heartbeat must not give the lease up
+        self.expire()
+        real_rename = os.rename
+
+        def rename_then_renew(source, tombstone):
+            real_rename(source, tombstone)
+            os.utime(tombstone)
+            self.node_a.renew()
+
+        with mock.patch.object(cluster_lease.os, 'rename', side_effect=rename_then_renew):
+            self.assertFalse(self.node_b.acquire(self.video))
+        self.assertIn(self.video, self.node_a.held)
+        self.assertTrue(self.node_a.holds(self.video))
+        self.assertEqual(self.node_a.owner(self.video), 'node-a')
+
+    def test_holds_waits_for_renamed_lease(self):
+        tombstone = f"{self.lease}.check.stale"
+        os.rename(self.lease, tombstone)
+        restore = threading.Timer(0.2, os.rename, args=(tombstone, self.lease))
+        restore.start()
+        self.addCleanup(restore.join)
+        self.assertTrue(self.node_a.holds(self.video))
+
+    def test_missing_lease_counts_as_lost_after_wait(self):
+        os.remove(self.lease)
+        with mock.patch.object(cluster_lease, 'RECLAIM_WAIT_SECONDS', 0.1):
+            self.assertFalse(self.node_a.holds(self.video))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import subprocess
+import unittest
+
+from PIL import Image
+from moviepy.config import FFMPEG_BINARY
+
+import ffmpeg_tools
+from video_probe import probe_video
+
+
+def audio_seconds(path: str) -> float:
+    """Decode the audio track and return how far it reached."""
+    result = subprocess.run([FFMPEG_BINARY, '-hide_banner', '-i', path, '-map', '0:a', '-f', 'null', '-'],
+                            stderr=subprocess.PIPE, text=True)
+    time_field = result.stderr.rsplit('time=', 1)[1].split()[0]
+    hours, minutes, seconds = time_field.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class SilentInputTest(unittest.TestCase):
+    """A source without audio still needs a middle audio track, or the concat with the MoviePy pieces breaks."""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.work_dir.cleanup)
+        self.input_path = self.path('silent.mp4')
+        subprocess.run([FFMPEG_BINARY, '-v', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=320x180:rate=25:duration=4',
+                        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', self.input_path], check=True)
+        self.logo_path = self.path('logo.png')
+        Image.new('RGBA', (32, 32), (255, 0, 0, 255)).save(self.logo_path)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.work_dir.name, name)
+
+    def assert_silent_track(self, output_path: str, duration: float):
+        self.assertTrue(probe_video(output_path)['audio'])
+        self.assertAlmostEqual(audio_seconds(output_path), duration, delta=0.2)
+
+    def test_single_pass_adds_silence(self):
+        output_path = self.path('middle.mp4')
+        ffmpeg_tools.render_static_overlay(self.input_path, 1.0, 3.0, self.logo_path, {'height': 16}, output_path,
+                                           'libx264', 'aac', 25, source_has_audio=False)
+        self.assert_silent_track(output_path, 2.0)
+
+    def test_chunked_adds_silence(self):
+        output_path = self.path('middle.mp4')
+        ffmpeg_tools.render_static_overlay_chunked(self.input_path, [0.0, 2.0, 4.0], self.logo_path, {'height': 16},
+                                                   output_path, 'libx264', 'aac', 25, self.work_dir.name, 2,
+                                                   source_has_audio=False)
+        self.assert_silent_track(output_path, 4.0)
+
+    def test_without_audio_when_pieces_have_none(self):
+        output_path = self.path('middle.mp4')
+        ffmpeg_tools.render_static_overlay(self.input_path, 1.0, 3.0, self.logo_path, {'height': 16}, output_path,
+                                           'libx264', 'aac', 25, include_audio=False, source_has_audio=False)
+        self.assertFalse(probe_video(output_path)['audio'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+Fast container metadata probe used instead of opening a full VideoFileClip.
+
+Reads duration, size, fps and audio presence from ffprobe's JSON output, or
+from FFmpeg's header dump when ffprobe is not installed. Neither starts a
+frame reader. Results are cached per (path, size, mtime), so repeated lookups
+during a job are free and a replaced file is probed again. Keyframe positions
+for chunked encoding and frame counts for output validation are read from
+packet headers the same way.
+"""
+
+import os
+import json
+import shutil
+import logging
+import subprocess
+from functools import lru_cache
+from fractions import Fraction
+from typing import List
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+logger = logging.getLogger(__name__)
+
+FFPROBE_BINARY = os.environ.get('FFPROBE_BINARY') or shutil.which('ffprobe')
+
+
+def _parse_rate(rate: str) -> float:
+    """Convert an ffprobe rate such as "30000/1001" to a float."""
+    try:
+        value = Fraction(rate)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+    return float(value)
+
+
+def _probe_with_ffprobe(video_path: str) -> dict:
+    """Read metadata from ffprobe's JSON output."""
+    result = subprocess.run(
+        [FFPROBE_BINARY, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {video_path}: {result.stderr.strip()[-300:]}")
+    data = json.loads(result.stdout)
+    streams = data.get('streams', [])
+    video_stream = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video_stream is None:
+        raise ValueError(f"No video stream found in {video_path}")
+
+    duration = data.get('format', {}).get('duration') or video_stream.get('duration')
+    fps = _parse_rate(video_stream.get('avg_frame_rate', '0/0')) or _parse_rate(video_stream.get('r_frame_rate', '0/0'))
+    return {
+        'duration': float(duration),
+        'size': [int(video_stream['width']), int(video_stream['height'])],
+        'fps': fps,
+        'audio': any(s.get('codec_type') == 'audio' for s in streams)
+    }
+
+
+def _probe_with_ffmpeg(video_path: str) -> dict:
+    """Read metadata from FFmpeg's header dump, the same data VideoFileClip starts from."""
+    infos = ffmpeg_parse_infos(video_path)
+    if not infos.get('video_found'):
+        raise ValueError(f"No video stream found in {video_path}")
+    return {
+        'duration': infos['duration'],
+        'size': list(infos['video_size']),
+        'fps': infos['video_fps'],
+        'audio': infos['audio_found']
+    }
+
+
+@lru_cache(maxsize=256)
+def _probe_cached(video_path: str, size: int, mtime_ns: int) -> dict:
+    """Probe a file version; size and mtime only take part in the cache key."""
+    if FFPROBE_BINARY:
+        return _probe_with_ffprobe(video_path)
+    return _probe_with_ffmpeg(video_path)
+
+
+def probe_video(video_path: str) -> dict:
+    """Return duration, size, fps and audio presence for a video file."""
+    stat = os.stat(video_path)
+    info = _probe_cached(os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+    # Hand out copies so callers cannot modify the cached entry
+    return {**info, 'size': list(info['size'])}
+
+
+def keyframe_times(video_path: str, start: float, end: float) -> List[float]:
+    """Return keyframe timestamps of the first video stream within [start, end].
+
+    Only packet headers are read. Returns an empty list when ffprobe is not
+    available, and callers then cut at nominal times.
+    """
+    if not FFPROBE_BINARY:
+        return []
+    result = subprocess.run(
+        [FFPROBE_BINARY, '-v', 'error', '-select_streams', 'v:0',
+         '-read_intervals', f"{start:.3f}%{end:.3f}",
+         '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        logger.warning(f"Could not list keyframes of {video_path}: {result.stderr.strip()[-300:]}")
+        return []
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            times.append(float(pts_time))
+    return sorted(t for t in times if start <= t <= end)
+
+
+def count_frames(video_path: str) -> int:
+    """Count the frames of the first video stream from packet headers, without decoding."""
+    if FFPROBE_BINARY:
+        result = subprocess.run(
+            [FFPROBE_BINARY, '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+             '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', video_path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffprobe could not count frames of {video_path}: {result.stderr.strip()[-300:]}")
+        return int(result.stdout.strip().rstrip(','))
+    # Stream-copying into the framecrc muxer prints one line per packet without decoding anything
+    result = subprocess.run(
+        [FFMPEG_BINARY, '-hide_banner', '-nostdin', '-v', 'error', '-i', video_path,
+         '-map', '0:v:0', '-c', 'copy', '-f', 'framecrc', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not count frames of {video_path}: {result.stderr.strip()[-300:]}")
+    return sum(1 for line in result.stdout.splitlines() if line and not line.startswith('#'))
@@ -0,0 +1,158 @@
+"""
+Process pool scheduler for running branding jobs in parallel.
+
+Each worker process builds its own processor instance once at start-up, so
+MoviePy readers, ffmpeg subprocesses and clip caches never leak between jobs
+running side by side.
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Processor instance owned by the current worker process
+_worker_processor = None
+
+
+def _init_worker(processor_factory: Callable[[], Any]):
+    """Create the per-process processor used by every job in this worker."""
+    global _worker_processor
+    _worker_processor = processor_factory()
+
+
+def _run_job(video_path: str, overrides: Optional[Dict[str, Any]] = None,
+             max_attempts: Optional[int] = None) -> Dict[str, Any]:
+    """Process one video inside a worker and report how long the worker was busy."""
+    started = time.time()
+    result = _worker_processor.process_video(video_path, overrides, max_attempts)
+    return {
+        'pid': os.getpid(),
+        'started': started,
+        'finished': time.time(),
+        'result': result,
+        # Metrics live in the parent, so the worker ships its job's numbers back with the result
+        'metrics': getattr(_worker_processor, 'last_job_metrics', None),
+        # Output the parent still has to validate before the job counts as done
+        'output': getattr(_worker_processor, 'last_output', None)
+    }
+
+
+def resolve_pool_size(settings: dict) -> int:
+    """Return the number of worker processes allowed by the settings."""
+    video_processing = settings.get('video_processing', {})
+    performance_settings = settings.get('performance_settings', {})
+    if not performance_settings.get('parallel_processing', False):
+        return 1
+    return max(1, int(video_processing.get('max_concurrent_processes', 1) or 1))
+
+
+class WorkerPool:
+    """Runs branding jobs on a pool of spawned worker processes."""
+
+    def __init__(self, max_workers: int, processor_factory: Callable[[], Any],
+                 on_report: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.max_workers = max_workers
+        self.processor_factory = processor_factory
+        self.on_report = on_report
+        self.executor_lock = threading.Lock()
+        self.executor = self._new_executor()
+        self.started_at = time.time()
+        self.stats_lock = threading.Lock()
+        self.worker_stats: Dict[int, Dict[str, float]] = {}
+        logger.info(f"Worker pool started with {max_workers} process(es)")
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn keeps workers free of the watcher threads and MoviePy state of the parent
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.processor_factory,)
+        )
+
+    def _replace_broken(self, broken: ProcessPoolExecutor):
+        """Start fresh workers after one died (OOM kill, segfault); a broken executor accepts no more jobs."""
+        with self.executor_lock:
+            if self.executor is not broken:
+                return
+            logger.warning("A worker process died; restarting the worker pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+
+    def submit(self, video_path: str, overrides: Optional[Dict[str, Any]] = None,
+               max_attempts: Optional[int] = None) -> Future:
+        """Schedule a video on the pool. The future resolves to the job's report ('result', 'output', ...).
+
+        A job whose worker died reports 'crashed', so the caller can run it again.
+        """
+        executor = self.executor
+        try:
+            job_future = executor.submit(_run_job, video_path, overrides, max_attempts)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            executor = self.executor
+            job_future = executor.submit(_run_job, video_path, overrides, max_attempts)
+        result_future: Future = Future()
+
+        def on_done(done: Future):
+            try:
+                report = done.result()
+            except BrokenProcessPool as e:
+                logger.error(f"Worker died while processing {video_path}: {e}")
+                self._replace_broken(executor)
+                result_future.set_result({'result': False, 'crashed': True})
+                return
+            except Exception as e:
+                logger.error(f"Worker failed while processing {video_path}: {e}")
+                result_future.set_result({'result': False})
+                return
+            self._record(report)
+            if self.on_report is not None:
+                try:
+                    self.on_report(report)
+                except Exception as e:
+                    logger.warning(f"Job report handler failed for {video_path}: {e}")
+            result_future.set_result(report)
+
+        job_future.add_done_callback(on_done)
+        return result_future
+
+    def _record(self, report: Dict[str, Any]):
+        """Accumulate busy time for the worker that ran a job."""
+        with self.stats_lock:
+            stats = self.worker_stats.setdefault(report['pid'], {'jobs': 0, 'busy_seconds': 0.0})
+            stats['jobs'] += 1
+            stats['busy_seconds'] += report['finished'] - report['started']
+
+    def utilization(self) -> Dict[int, Dict[str, float]]:
+        """Return jobs, busy time and busy fraction for every worker seen so far."""
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        with self.stats_lock:
+            return {
+                pid: {
+                    'jobs': stats['jobs'],
+                    'busy_seconds': stats['busy_seconds'],
+                    'utilization': min(stats['busy_seconds'] / elapsed, 1.0)
+                }
+                for pid, stats in self.worker_stats.items()
+            }
+
+    def log_utilization(self):
+        """Log per-worker utilization."""
+        for pid, stats in sorted(self.utilization().items()):
+            logger.info(
+                f"Worker {pid}: {stats['jobs']} job(s), busy {stats['busy_seconds']:.1f}s "
+                f"({stats['utilization'] * 100:.0f}% utilization)"
+            )
+
+    def shutdown(self, wait: bool = True):
+        """Stop the pool, optionally waiting for running jobs to finish."""
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        self.log_utilization()